@@ -0,0 +1,128 @@
+"""
+Collection based artists for the 3D axes : one artist for many elements
+"""
+import matplotlib
+import numpy as np
+from matplotlib.colors import to_rgba
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+class VectorTrail:
+    """
+    Track of vectors starting from (0,0,0) held in one Line3DCollection and one marker collection
+    Segments are stored in a ring buffer, the last vector written has an opacity of 1 then decreasing
+    """
+    def __init__(self,ax,nVector,color='red',marker='>'):
+        self.ax=ax
+        self.rgba=np.array(to_rgba(color))
+        self.lines=Line3DCollection([])
+        ax.add_collection(self.lines,autolim=False)
+        self.markers=ax.scatter([],[],[],marker=marker,depthshade=False)
+        self.resize(nVector)
+
+    def artists(self):
+        return [self.lines,self.markers]
+
+    def resize(self,nVector):
+        '''Allocate the ring buffer for nVector vectors, previous vectors are deleted'''
+        self.nVector=nVector
+        self.segments=np.zeros((nVector,2,3)) #[vector][origin,end][x,y,z]
+        self.points=self.segments.reshape(-1,3) #View of the segments for markers on both ends
+        self.colors=np.tile(self.rgba,(nVector,1))
+        self.filled=np.zeros(nVector,dtype=bool) #Vectors never written are hidden
+        self.lines.set_segments(self.segments)
+        self.opacity(nVector,nVector-1)
+
+    def clear(self):
+        self.filled[:]=False
+        self.opacity(len(self.filled),len(self.filled)-1)
+
+    def push(self,nVect,ind,point):
+        '''Write the vector to point at the index ind, only the nVect first vectors are shown'''
+        self.write(ind,point)
+        self.opacity(nVect,ind)
+
+    def write(self,ind,point):
+        self.segments[ind,1]=point
+        #Sample off of a fragmented curve (NaN) : the vector is hidden
+        self.filled[ind]=not(np.isnan(self.segments[ind,1]).any())
+
+    def opacity(self,nVect,ind):
+        '''attenuation decreasing in 1/nVect, vector at ind has an opacity of 1'''
+        alpha=self.colors[:,3]
+        alpha[nVect:]=0
+        alpha[:nVect]=np.roll(np.arange(1,nVect+1)/nVect,ind+1)
+        alpha*=self.filled
+        self.update()
+
+    def update(self):
+        #Segments are shared with the collection, markers need their offsets again
+        self.lines.set_color(self.colors)
+        self.lines.stale=True
+        self.markers.set_color(np.repeat(self.colors,2,axis=0))
+        self.markers.set_offsets(self.points[:,:2])
+        self.markers.set_3d_properties(self.points[:,2],'z')
+        #Blitted frames skip Axes3D.draw where collections are projected, do it here
+        if(self.ax.M is not None):
+            self.lines.do_3d_projection()
+            self.markers.do_3d_projection()
+
+class GatedCurve:
+    """
+    Visible segments of a gated curve (gating.Segments) held in one Line3DCollection, background of the animation
+    Segments of one sample are drawn as markers
+    """
+    def __init__(self,ax,color='blue'):
+        self.segments=None
+        self.lines=Line3DCollection([],colors=color)
+        ax.add_collection(self.lines,autolim=False)
+        self.points,=ax.plot([],[],[],linestyle='',marker='.',color=color)
+
+    def setSegments(self,segments):
+        '''segments : gating.Segments or None to hide the curve'''
+        if(segments is self.segments):
+            return
+        self.segments=segments
+        self.lines.set_segments([] if segments is None else segments.pieces())
+        self.points.set_data_3d(*(np.empty((3,0)) if segments is None else segments.singles()))
+
+class EnsembleCurves:
+    """
+    N curves of an ensemble of waves held in one Line3DCollection, background of the animation
+    Points of the N waves at the current time held in one marker collection
+    """
+    def __init__(self,ax,cmap='viridis'):
+        self.ax=ax
+        self.cmap=matplotlib.colormaps[cmap]
+        self.ensemble=None
+        self.lines=Line3DCollection([],linewidths=0.6)
+        ax.add_collection(self.lines,autolim=False)
+        self.tips=ax.scatter([],[],[],s=8,depthshade=False)
+
+    def artists(self):
+        return [self.tips]
+
+    def setEnsemble(self,ensemble):
+        '''ensemble : (N,3,nPoint) array or None to hide the curves'''
+        self.ensemble=ensemble
+        if(ensemble is None):
+            self.lines.set_segments([])
+            self.tips.set_offsets(np.empty((0,2)))
+            self.tips.set_3d_properties([],'z')
+            return
+        colors=self.cmap(np.linspace(0,1,len(ensemble)))
+        colors[:,3]=0.5
+        self.lines.set_segments(ensemble.transpose(0,2,1)) #(N,nPoint,3) view of the ensemble
+        self.lines.set_color(colors)
+        colors[:,3]=1
+        self.tips.set_color(colors)
+        self.plotTime(0)
+
+    def plotTime(self,time):
+        if(self.ensemble is None):
+            return
+        points=self.ensemble[:,:,time]
+        self.tips.set_offsets(points[:,:2])
+        self.tips.set_3d_properties(points[:,2],'z')
+        #Blitted frames skip Axes3D.draw where collections are projected, do it here
+        if(self.ax.M is not None):
+            self.tips.do_3d_projection()
@@ -0,0 +1,142 @@
+"""
+Benchmarks of trajectory generation, frame update and export, headless (Agg backend)
+Results are saved as JSON, two runs can be compared with a regression threshold
+
+usage : python benchmark.py -o new.json
+        python benchmark.py -o new.json --compare old.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import matplotlib
+import numpy as np
+from parameters import animParameters,presetParameters,gateParameters
+import trajectory
+import gating
+import export
+
+nPointSweep=[360,3600,36000,360000,1000000]
+nPointQuick=[360,36000]
+presetQuick=['Flat Disk','Swinging Rotation']
+
+def measure(func,repeat):
+    '''Best time of repeat calls and peak memory (bytes) of one call'''
+    best=float('inf')
+    for i in range(repeat):
+        start=time.perf_counter()
+        func()
+        best=min(best,time.perf_counter()-start)
+    tracemalloc.start()
+    func()
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best,peak
+
+def benchTrajectory(nPoints,repeat):
+    '''Dense trajectory, and the gated one (computeGated, uncached gatedTrajectory) of each gating pattern'''
+    results=[]
+    wave=export.makeJob('bench')['waveParameters']
+    with tempfile.TemporaryDirectory() as folder:
+        #Mask of about 1000 samples with runs of random lengths, repeated along the curve
+        path=os.path.join(folder,'mask.npy')
+        np.save(path,np.repeat(np.arange(50)%2==0,np.random.default_rng(0).integers(1,40,50)))
+        gates=[gating.makeGate(pattern,animParameters['fragmentedPlotLen'],animParameters['fragmentedNoPlotLen'],dict(gateParameters,path=path)) for pattern in gating.patterns]
+        for nPoint in nPoints:
+            best,peak=measure(lambda:trajectory.computeTrajectory(wave,nPoint,None),repeat)
+            results.append({'name':'trajectory nPoint=%d fragmented=False'%nPoint,'samples/s':nPoint/best,'time (s)':best,'peak memory (B)':peak})
+            for gate in gates:
+                best,peak=measure(lambda:trajectory.computeGated(wave,nPoint,gate),repeat)
+                results.append({'name':'trajectory nPoint=%d gate=%s'%(nPoint,gate[0]),'samples/s':nPoint/best,'time (s)':best,'peak memory (B)':peak})
+    return results
+
+def benchFrames(presets,nPoints,nFrames,repeat):
+    '''update only (drawFrame) and full blitted frame (render) for each preset, track lengths and fragmented mode'''
+    results=[]
+    for preset in presets:
+        for nPoint in nPoints:
+            for nVector in sorted({1,max(1,nPoint//8),nPoint//2}):
+                for fragmented in (False,True):
+                    job=export.makeJob('bench',preset=preset,jobState={'vectorTrack':True,'timeTrack':True,'fragmented':fragmented},jobAnim={'nPoint':nPoint,'nVector':nVector})
+                    scene=export.HeadlessScene(job)
+                    frames=[int(f) for f in np.linspace(0,nPoint-1,nFrames)]
+                    best,peak=measure(lambda:[scene.drawFrame(f) for f in frames],repeat)
+                    name='%s nPoint=%d nVector=%d fragmented=%s'%(preset,nPoint,nVector,fragmented)
+                    results.append({'name':'update '+name,'frames/s':nFrames/best,'time (s)':best,'peak memory (B)':peak})
+                    best,peak=measure(lambda:[scene.render(f) for f in range(nFrames)],repeat)
+                    results.append({'name':'render '+name,'frames/s':nFrames/best,'time (s)':best,'peak memory (B)':peak})
+    return results
+
+def benchExport(nFrames,jobs,repeat):
+    results=[]
+    with tempfile.TemporaryDirectory() as folder:
+        path=os.path.join(folder,'bench.gif')
+        job=export.makeJob(path,preset='Wide Cone',jobState={'vectorTrack':True,'timeTrack':True},jobAnim={'nPoint':nFrames,'nVector':nFrames//4})
+        best,peak=measure(lambda:export.exportClips([(path,job)],jobs),repeat)
+        results.append({'name':'export gif nFrames=%d jobs=%s'%(nFrames,jobs),'frames/s':nFrames/best,'time (s)':best,'peak memory (B)':peak})
+    return results
+
+def compare(results,baseline,threshold):
+    '''Cases slower than the baseline : throughput lower than (1-threshold) times, or time longer than (1+threshold) times without throughput'''
+    previous={case['name']:case for case in baseline['results']}
+    regressions=[]
+    for case in results:
+        old=previous.get(case['name'])
+        if(old is None):
+            continue
+        rates=[key for key in ('samples/s','frames/s') if key in case]
+        for key in rates:
+            if(case[key]<(1-threshold)*old[key]):
+                regressions.append('%s : %.4g %s (baseline %.4g)'%(case['name'],case[key],key,old[key]))
+        if(not(rates) and case['time (s)']>(1+threshold)*old['time (s)']):
+            regressions.append('%s : %.3f s (baseline %.3f s)'%(case['name'],case['time (s)'],old['time (s)']))
+    return regressions
+
+def addReportArguments(parser,output):
+    parser.add_argument('-o','--output',default=output,help='JSON file of the results')
+    parser.add_argument('--compare',default=None,help='JSON file of a previous run')
+    parser.add_argument('--threshold',type=float,default=0.2,help='relative loss counted as a regression')
+
+def report(results,output,baseline=None,threshold=0.2):
+    '''Write the results and the versions used in output (JSON), exit 1 when a case is slower than in the JSON file baseline (see compare)'''
+    info={'python':sys.version.split()[0],'numpy':np.__version__,'matplotlib':matplotlib.__version__,'platform':platform.platform(),'cpus':os.cpu_count()}
+    with open(output,'w') as f:
+        json.dump({'info':info,'results':results},f,indent=1)
+    if(baseline is not None):
+        with open(baseline) as f:
+            regressions=compare(results,json.load(f),threshold)
+        for line in regressions:
+            print('REGRESSION '+line)
+        if(regressions):
+            sys.exit(1)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Benchmarks of the 3D wave visualisation')
+    addReportArguments(parser,'benchmark.json')
+    parser.add_argument('--quick',action='store_true',help='smaller sweep')
+    parser.add_argument('--preset',action='append',default=None,help='preset of the update/render cases, can be repeated (all by default)')
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--frames',type=int,default=60,help='frames per update/render case')
+    parser.add_argument('--jobs',type=int,default=None,help='worker processes of the export case')
+    parser.add_argument('--frame-npoint',type=int,default=3600,help='largest nPoint of the update/render cases')
+    args=parser.parse_args(argv)
+
+    nPoints=nPointQuick if args.quick else nPointSweep
+    presets=args.preset or (presetQuick if args.quick else list(presetParameters))
+    export.parsePresets(parser,presets)
+    results=benchTrajectory(nPoints,args.repeat)
+    #Frames are benchmarked at displayable sizes, 10^6 arrows take minutes per case
+    results+=benchFrames(presets,[n for n in nPoints if n<=args.frame_npoint],args.frames,args.repeat)
+    results+=benchExport(animParameters['nPoint'] if not(args.quick) else 60,args.jobs,1)
+    for case in results:
+        rate=case.get('samples/s',case.get('frames/s'))
+        unit='samples/s' if 'samples/s' in case else 'frames/s'
+        print('%-80s %12.4g %-9s %8.1f MB'%(case['name'],rate,unit,case['peak memory (B)']/1e6))
+    report(results,args.output,args.compare,args.threshold)
+
+if __name__=='__main__':
+    main()
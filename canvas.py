@@ -0,0 +1,267 @@
+"""
+Canvas of the GUI : matplotlib figure in Qt with the animation, trajectories computed in a worker thread
+Imported once the window is shown, matplotlib is the longest import of the program
+Blitting relies on the background cache of FuncAnimation, matplotlib 2.0 to 3.11 (see onDraw)
+"""
+import PyQt5.QtCore as QtCore
+import PyQt5.QtWidgets as QtWidgets
+import matplotlib.animation as animation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import (FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar)
+from parameters import animParameters,state,waveParameters,ensembleParameters,streamParameters,sweepParameters,gateParameters,viewParameters
+from scene import WaveScene,generate
+
+#Compute trajectories outside of the GUI thread
+class TrajectoryWorker(QtCore.QObject):
+    ready=QtCore.pyqtSignal(int,object)
+    failed=QtCore.pyqtSignal(int,str)
+
+    def __init__(self,profiler):
+        super().__init__()
+        self.profiler=profiler
+        self.lastRequest=0 #Set by the GUI thread, requests older than this one are discarded
+
+    @QtCore.pyqtSlot(int,object,int,object,bool,object)
+    def compute(self,request,waves,nPoint,fragmented,normalize,sweep):
+        if(request!=self.lastRequest):
+            return
+        try:
+            with self.profiler.stage('Bgen'):
+                result=generate(waves,nPoint,fragmented,normalize,sweep)
+        except Exception as error:
+            #An exception reaching the slot would abort the application (MemoryError, file of a mask or of the store...)
+            self.failed.emit(request,'%s : %s'%(type(error).__name__,error))
+            return
+        if(request==self.lastRequest):
+            self.ready.emit(request,result)
+
+#Canvas where animation object is displayed
+class MplCanvas(FigureCanvasQTAgg,WaveScene):
+    requested=QtCore.pyqtSignal(int,object,int,object,bool,object)
+
+    def __init__(self, parent=None, width=500, height=400, dpi=100):
+        #width and height in pixels, the figure is added to a window already shown
+        fig=Figure(figsize=(width/dpi, height/dpi), dpi=dpi)
+        super(MplCanvas, self).__init__(fig)
+        self.initScene(fig,waveParameters,state,animParameters,ensembleParameters,streamParameters,sweepParameters=sweepParameters,gateParameters=gateParameters,viewParameters=viewParameters)
+        self.fps=1000/animParameters['interval']
+        #Live statistics of the profiler, top left of the axes
+        self.overlay=self.ax.text2D(0.01,0.99,'',transform=self.ax.transAxes,va='top',family='monospace',fontsize=5)
+        self.overlay.set_animated(animParameters['blit'])
+        self.initWorker()
+        self.refreshBackground()
+        self.sleeping=False #Timer stopped while the scene is still, see sleep
+        self.anim()
+        self.observe()
+        #Background cached for blitting is outdated after each full draw (rotation, zoom, resize...)
+        self.mpl_connect('draw_event',self.onDraw)
+    def anim(self):
+        """
+        Call funcAnimation of animation module which call animate
+        """
+        #nPoint frames, or the frames of the whole sweep, see func_clear when it changes
+        self.animKey=(self.frameCount(),self.keyframes is not None)
+        #Artists are set animated by FuncAnimation when they are returned by animate (the static curves during a sweep)
+        for artist in self.morphingArtists():
+            artist.set_animated(False)
+        self.animation = animation.FuncAnimation(self.fig, self.animate,frames=self.animKey[0], blit=animParameters['blit'],interval=animParameters['interval'],repeat=animParameters['repeat'],save_count=self.animKey[0],repeat_delay=animParameters['repeat_delay']) #function of matplotlib module, call animate at each frame, call init for the first frame
+
+    def animate(self,frame):
+        #The timer runs : restarted by matplotlib after a resize or by resume, sleep can pause it again
+        self.sleeping=False
+        with self.profiler.stage('update'):
+            if(self.stream is not None):
+                artists=self.streamFrame(frame)
+                if(self.limitsChanged):
+                    self.draw_idle()
+            else:
+                artists=self.drawFrame(frame)
+        if(self.profiler.enabled):
+            if(frame%10==0):
+                self.overlay.set_text(self.profiler.overlayText())
+            artists.append(self.overlay)
+        elif(self.isStill()):
+            #This frame is the last one needed, the timer is stopped once it is drawn
+            QtCore.QTimer.singleShot(0,self.sleep)
+        return artists
+
+    def sleep(self):
+        '''Stop the timer of a still scene (no CPU used), the last frame stays on the canvas until wake'''
+        if(self.isStill() and not(self.sleeping)):
+            self.sleeping=True
+            self.animation.pause()
+
+    def wake(self):
+        if(self.sleeping):
+            self.sleeping=False
+            self.animation.resume()
+
+    def observe(self):
+        '''Changes of the parameters are applied by applyChanges, once for all the changes made by the same event'''
+        self.changes=[]
+        for parameters in (self.waveParameters,self.state,self.animParameters,self.ensembleParameters,self.sweepParameters,self.gateParameters,self.viewParameters):
+            parameters.observers.append(self.parametersChanged)
+
+    def parametersChanged(self,parameters,name,value):
+        if(parameters is self.state and name=='stream'):
+            #Applied now, the widget that enabled the stream gets the OSError
+            self.setStream(value)
+            return
+        if(self.changes==[]):
+            QtCore.QTimer.singleShot(0,self.applyChanges)
+        self.changes.append((parameters,name))
+
+    def applyChanges(self):
+        '''Update the scene for the parameters changed since the last call, only what depends on them'''
+        changes,self.changes=self.changes,[]
+        if(changes==[]):
+            return
+        bgen=False
+        background=False
+        layout=False
+        for parameters,name in changes:
+            if(parameters is self.viewParameters):
+                layout=True
+            elif(parameters is self.waveParameters):
+                bgen=True
+            elif(parameters is self.ensembleParameters):
+                bgen=bgen or self.state['ensemble']
+            elif(parameters is self.sweepParameters):
+                bgen=bgen or self.state['sweep']
+            elif(parameters is self.gateParameters):
+                bgen=bgen or self.state['fragmented']
+            elif(parameters is self.animParameters):
+                if(name=='fragmentedPlotLen' or name=='fragmentedNoPlotLen'):
+                    bgen=bgen or self.state['fragmented']
+                if(name=='nVector'):
+                    self.resizeVect()
+            elif(name=='static' or name=='autoscale'):
+                background=True
+            elif(name=='timeTrack'):
+                self.initCoord(self.figDic['track'][0])
+            elif(name=='vectorTrack' or name=='vector'):
+                self.initVect()
+            elif(name=='fragmented' or name=='ensemble' or name=='sweep'):
+                bgen=True
+            elif(name=='profiler'):
+                self.setProfiler(self.state['profiler'])
+        if(layout):
+            #New axes : full draw, the background of the blit is taken again
+            self.layoutViews()
+            self.draw_idle()
+        if(bgen):
+            self.requestBgen()
+        elif(background):
+            self.refreshBackground()
+        self.wake()
+
+    def setProfiler(self,enabled):
+        self.profiler.reset()
+        self.profiler.enabled=enabled
+        self.overlay.set_text('')
+        self.draw_idle()
+
+    def setStream(self,enabled):
+        '''Start (source described by streamParameters) or stop the streaming mode, OSError if the source can not be opened'''
+        if(enabled):
+            from sources import openSource
+            self.startStream(openSource(self.streamParameters,self.waveParameters,self.animParameters['nPoint']))
+        else:
+            self.stopStream()
+        self.func_clear()
+
+    def draw(self):
+        with self.profiler.stage('draw'):
+            #Size of the canvas or zoom may have changed since the last full draw
+            self.updateLod()
+            super().draw()
+
+    def blit(self,bbox=None):
+        with self.profiler.stage('blit'):
+            super().blit(bbox)
+
+    def onDraw(self,event):
+        '''Forget the blit background after a full draw so the next frame copies the new one'''
+        #FuncAnimation only copies the background again when the view of the axes changes, not their content (static curve, views...)
+        #No public API drops it : _blit_cache is its dict of the backgrounds by axes in matplotlib 2.0 to 3.11 (tested with 3.11),
+        #a version without it keeps the old background until the next rotation or zoom instead of failing
+        cache=getattr(self.animation,'_blit_cache',None)
+        if(animParameters['blit'] and cache is not None):
+            cache.clear()
+
+    def initWorker(self):
+        self.request=0
+        self.workerThread=QtCore.QThread()
+        self.worker=TrajectoryWorker(self.profiler)
+        self.worker.moveToThread(self.workerThread)
+        self.requested.connect(self.worker.compute)
+        self.worker.ready.connect(self.trajectoryReady)
+        self.worker.failed.connect(self.trajectoryFailed)
+        self.workerThread.start()
+
+    def requestBgen(self):
+        '''Ask the worker for a new Barray, the animation keeps running until trajectoryReady'''
+        #Parameters changed, the session opened is not shown anymore
+        self.session=None
+        try:
+            args=self.BgenArgs()
+        except ValueError as error:
+            #Parameters that cannot be computed (gate) : the current trajectory is kept
+            self.showError(str(error))
+            return
+        self.request+=1
+        self.worker.lastRequest=self.request
+        self.requested.emit(self.request,*args)
+
+    def showError(self,message):
+        QtWidgets.QMessageBox.warning(self,'Trajectory','Trajectory not computed : '+message)
+
+    def trajectoryReady(self,request,result):
+        #Superseded while computed
+        if(request!=self.request):
+            return
+        self.setTrajectory(result)
+        self.func_clear()
+
+    def trajectoryFailed(self,request,message):
+        '''The previous trajectory stays on the canvas'''
+        if(request==self.request):
+            self.showError(message)
+
+    def openSession(self,path,result):
+        '''Show the trajectory saved in path (result of loadTrajectory), the parameters are already the ones of the session'''
+        #Results of the worker requested before are outdated, as the changes of the parameters to the ones of the session
+        self.changes=[]
+        self.request+=1
+        self.worker.lastRequest=self.request
+        self.session=path
+        self.setTrajectory(result)
+        self.func_clear()
+
+    def refreshBackground(self):
+        '''Update what does not move during the animation (static plot, scale) then redraw it once if it changed'''
+        if(self.refreshStatic()):
+            self.draw_idle()
+
+    def func_clear(self):
+        '''clear draw and reset coord '''
+        self.animation.pause()
+        if(self.animKey!=(self.frameCount(),self.keyframes is not None)):
+            #Frames of FuncAnimation are fixed, new animation for the new length (session, sweep)
+            self.anim()
+            self.animation.pause()
+        #reset frame
+        self.animation.frame_seq=self.animation.new_frame_seq()
+        #delete former values computed
+        self.initCoord(self.figDic['track'][0])
+        self.resizeVect()
+        self.refreshBackground()
+        self.sleeping=False
+        self.animation.resume()
+
+    def stopAnim(self):
+        self.animation.repeat=False
+        self.animation.__del__()
+        self.stopStream()
+        self.workerThread.quit()
+        self.workerThread.wait()
@@ -0,0 +1,122 @@
+"""
+Scripting API of the presets and catalogue of thumbnails, no QApplication needed
+A preset with overrides of its free parameters is resolved into waveParameters and a trajectory,
+the catalogue renders one PNG for every preset and combination of a parameter grid across a process pool
+and lists them in catalogue.json (file, preset, overrides and waveParameters)
+
+usage : python catalogue.py --all-presets -o catalogue
+        python catalogue.py --preset "Wide Cone" --grid "amplitude z=1,2,3" --grid "phase y=0:3.14:4" -o catalogue --jobs 4
+"""
+import argparse
+import itertools
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.image import imsave
+from parameters import animParameters,state,presetParameters,presetFree,presetWave,parametersName
+from views import viewNames
+from trajectory import trajectory
+from export import HeadlessScene,makeJob,parseSwitches,parsePresets
+
+def presetTrajectory(presetName,overrides=None,nPoint=None,gate=None,base=None):
+    """
+    waveParameters of the preset with overrides (see presetWave) and its (3,nPoint) trajectory
+    The array is read-only (shared by the cache), samples off are NaN when gate is set (see gating.py)
+    """
+    wave=presetWave(presetName,base=base,overrides=overrides)
+    return wave,trajectory(wave,animParameters['nPoint'] if nPoint is None else nPoint,gate)
+
+def parameterGrid(grid):
+    '''grid : {name:values}, list of the overrides of every combination of the values'''
+    return [dict(zip(grid,values)) for values in itertools.product(*grid.values())]
+
+def catalogueEntries(presets,grid=None):
+    """
+    (preset,overrides) of every preset and every combination of the grid
+    Parameters of the grid which are not free in a preset are left out for it, without duplicates
+    """
+    entries=[]
+    for preset in presets:
+        free=presetFree(preset)
+        seen=[]
+        for overrides in parameterGrid(grid or {}):
+            overrides={name:value for name,value in overrides.items() if name in free}
+            if(overrides not in seen):
+                seen.append(overrides)
+                entries.append((preset,overrides))
+    return entries
+
+def entryName(preset,overrides):
+    '''File name (without extension) of an entry, e.g. Wide_Cone-amplitude_z=2'''
+    return '-'.join([preset]+['%s=%g'%(name,value) for name,value in overrides.items()]).replace(' ','_')
+
+def renderThumbnail(path,job,frame):
+    '''Write the PNG of frame of the job (see export.makeJob)'''
+    scene=HeadlessScene(job)
+    width,height=scene.canvas.get_width_height()
+    imsave(path,np.frombuffer(scene.render(frame),dtype=np.uint8).reshape(height,width,3))
+    return path
+
+def renderCatalogue(entries,output,jobs=None,frame=0,jobState=None,jobAnim=None,jobView=None,figsize=(3.2,2.4),dpi=100):
+    """
+    entries : list of (preset,overrides), see catalogueEntries
+    PNG of every entry written in output by a pool of jobs processes, return the records of catalogue.json
+    """
+    os.makedirs(output,exist_ok=True)
+    records=[]
+    with ProcessPoolExecutor(jobs) as pool:
+        futures=[]
+        for preset,overrides in entries:
+            path=os.path.join(output,entryName(preset,overrides)+'.png')
+            job=makeJob(path,wave=presetWave(preset,overrides=overrides),jobState=jobState,jobAnim=jobAnim,figsize=figsize,dpi=dpi,jobView=jobView)
+            futures.append(pool.submit(renderThumbnail,path,job,frame))
+            records.append({'file':os.path.basename(path),'preset':preset,'overrides':overrides,'waveParameters':job['waveParameters']})
+        for future in futures:
+            future.result()
+    with open(os.path.join(output,'catalogue.json'),'w') as file:
+        json.dump(records,file,indent=1)
+    return records
+
+def parseGrid(parser,values):
+    '''{name:values} from "name=v1,v2,..." or "name=start:stop:n"'''
+    grid={}
+    for value in values:
+        name,sep,numbers=value.partition('=')
+        if(sep=='' or name not in parametersName):
+            parser.error('bad grid %s, expected "parameter=v1,v2" or "parameter=start:stop:n" with a parameter in %s'%(value,', '.join(parametersName)))
+        try:
+            if(':' in numbers):
+                start,stop,n=numbers.split(':')
+                grid[name]=list(np.linspace(float(start),float(stop),int(n)))
+            else:
+                grid[name]=[float(number) for number in numbers.split(',')]
+        except ValueError:
+            parser.error('bad values in the grid '+value)
+    return grid
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Render a PNG for every preset and combination of a parameter grid')
+    parser.add_argument('--preset',action='append',default=[],help='name of a preset, can be repeated')
+    parser.add_argument('--all-presets',action='store_true',help='every preset (default)')
+    parser.add_argument('--grid',action='append',default=[],help='values of a free parameter, "amplitude z=1,2,3" or "phase y=0:3.14:5", can be repeated')
+    parser.add_argument('-o','--output',default='catalogue',help='output folder')
+    parser.add_argument('--jobs',type=int,default=None,help='number of worker processes')
+    parser.add_argument('--frame',type=int,default=0,help='frame of the animation drawn')
+    parser.add_argument('--state',default=None,help='comma separated list of enabled states, e.g. vector,timeTrack')
+    parser.add_argument('--views',default=None,help='comma separated list of 2D views shown next to the 3D axes, e.g. x-t,XY')
+    parser.add_argument('--nPoint',type=int,default=animParameters['nPoint'])
+    parser.add_argument('--dpi',type=int,default=100)
+    parser.add_argument('--figsize',type=float,nargs=2,default=(3.2,2.4))
+    args=parser.parse_args(argv)
+
+    presets=parsePresets(parser,args.preset if args.preset and not(args.all_presets) else list(presetParameters))
+    entries=catalogueEntries(presets,parseGrid(parser,args.grid))
+    jobState=parseSwitches(parser,args.state,list(state),'state')
+    jobView=parseSwitches(parser,args.views,viewNames,'view')
+    records=renderCatalogue(entries,args.output,args.jobs,args.frame,jobState,{'nPoint':args.nPoint},jobView,args.figsize,args.dpi)
+    for record in records:
+        print(os.path.join(args.output,record['file']))
+
+if __name__=='__main__':
+    main()
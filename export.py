@@ -0,0 +1,261 @@
+"""
+Headless export of animations, no QApplication needed
+Frames are rendered on the Agg backend across a process pool and streamed
+into an ffmpeg pipe (mp4, gif) or into the GIF encoder of Pillow
+
+usage : python export.py --preset "Flat Disk" --preset "Wide Cone" -o clips --format gif
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib import rcParams
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from parameters import animParameters,state,waveParameters,presetParameters,presetWave,ensembleParameters,sweepParameters,gateParameters,viewParameters
+from views import viewNames
+from gating import patterns,makeGate
+from scene import WaveScene,generateArgs,frameCount
+import store
+
+chunkLen=30 #Number of frames rendered by a worker at once
+paletteLen=30 #Frames of a GIF used for its palette
+
+class HeadlessScene(WaveScene):
+    """
+    Scene drawn on an Agg canvas, background rendered once then only moving artists are blitted
+    """
+    def __init__(self,job):
+        self.fig=Figure(figsize=job['figsize'],dpi=job['dpi'])
+        self.canvas=FigureCanvasAgg(self.fig)
+        self.initScene(self.fig,job['waveParameters'],job['state'],job['animParameters'],job['ensembleParameters'],session=job['session'],sweepParameters=job['sweepParameters'],gateParameters=job['gateParameters'],viewParameters=job['viewParameters'])
+        self.refreshStatic()
+        for artist in self.movingArtists():
+            artist.set_animated(True)
+        self.canvas.draw()
+        self.background=self.canvas.copy_from_bbox(self.fig.bbox)
+        self.lastFrame=-1
+
+    def render(self,frame):
+        '''RGB buffer (bytes) of the frame'''
+        #Vectors of the track written before frame are replayed when frames are skipped
+        if(frame!=self.lastFrame+1):
+            self.initVect()
+            for t in range(max(0,frame-self.animParameters['nVector']+1),frame):
+                self.drawFrame(t)
+        self.lastFrame=frame
+        self.canvas.restore_region(self.background)
+        for artist in self.drawFrame(frame):
+            self.ax.draw_artist(artist)
+        return np.asarray(self.canvas.buffer_rgba())[:,:,:3].tobytes()
+
+_workerScenes={} #One scene per job in each worker process
+
+def renderChunk(job,start,stop):
+    key=job['name']
+    if(key not in _workerScenes):
+        _workerScenes.clear()
+        _workerScenes[key]=HeadlessScene(job)
+    scene=_workerScenes[key]
+    return [scene.render(frame) for frame in range(start,stop)]
+
+def makeJob(name,wave=None,preset=None,jobState=None,jobAnim=None,figsize=(6.4,4.8),dpi=100,jobEnsemble=None,session=None,jobSweep=None,jobGate=None,jobView=None):
+    """
+    Everything a worker needs to render a clip, wave are waveParameters (partial dictionary completed with
+    the default values), preset is a name of presetParameters, jobState, jobAnim, jobEnsemble, jobSweep, jobGate and jobView update
+    state, animParameters, ensembleParameters, sweepParameters, gateParameters and viewParameters
+    session : path of a saved trajectory (store.writeTrajectory), its parameters are the default values and
+    its frames are read from disk by the workers
+    """
+    defaults=(waveParameters,state,animParameters,ensembleParameters,gateParameters)
+    if(session is not None):
+        saved=store.openTrajectory(session)[1]
+        defaults=(saved['waveParameters'],saved['state'],dict(saved['animParameters'],nPoint=saved['nPoint']),saved['ensembleParameters'],saved.get('gateParameters',gateParameters))
+    if(preset is not None):
+        base=presetWave(preset)
+    else:
+        base=dict(defaults[0])
+    base.update(wave or {})
+    return {'name':name,'waveParameters':base,'state':dict(defaults[1],**(jobState or {})),'animParameters':dict(defaults[2],**(jobAnim or {})),'ensembleParameters':dict(defaults[3],**(jobEnsemble or {})),'sweepParameters':dict(sweepParameters,**(jobSweep or {})),'gateParameters':dict(defaults[4],**(jobGate or {})),'viewParameters':dict(viewParameters,**(jobView or {})),'figsize':figsize,'dpi':dpi,'session':session}
+
+def ffmpegCommand(path,width,height,fps):
+    ffmpeg=shutil.which(rcParams['animation.ffmpeg_path'])
+    if(ffmpeg is None):
+        return None
+    command=[ffmpeg,'-y','-loglevel','error','-f','rawvideo','-pix_fmt','rgb24','-s','%dx%d'%(width,height),'-r',str(fps),'-i','-']
+    if(not(path.endswith('.gif'))):
+        command+=['-vf','pad=ceil(iw/2)*2:ceil(ih/2)*2','-vcodec','libx264','-pix_fmt','yuv420p']
+    return command+[path]
+
+def writeClip(path,frames,size,fps):
+    """
+    frames : iterator of RGB buffers, written as soon as they are available
+    """
+    width,height=size
+    command=ffmpegCommand(path,width,height,fps)
+    if(command is not None):
+        process=subprocess.Popen(command,stdin=subprocess.PIPE)
+        for frame in frames:
+            process.stdin.write(frame)
+        process.stdin.close()
+        if(process.wait()!=0):
+            raise RuntimeError('ffmpeg failed to write '+path)
+    elif(path.endswith('.gif')):
+        writeGif(path,frames,size,fps)
+    else:
+        raise RuntimeError('ffmpeg is needed to write '+path)
+
+def writeGif(path,frames,size,fps):
+    """
+    GIF encoded by Pillow frame by frame, only the first paletteLen frames are kept in memory
+    One palette for the whole clip, from the first and the last of these frames
+    """
+    from PIL import Image,GifImagePlugin
+    frames=iter(frames)
+    first=[Image.frombuffer('RGB',size,frame) for frame in itertools.islice(frames,paletteLen)]
+    mosaic=Image.new('RGB',(size[0],2*size[1]))
+    mosaic.paste(first[0],(0,0))
+    mosaic.paste(first[-1],(0,size[1]))
+    palette=mosaic.quantize(255)
+    images=itertools.chain(first,(Image.frombuffer('RGB',size,frame) for frame in frames))
+    with open(path,'wb') as file:
+        for i,image in enumerate(images):
+            image=image.quantize(palette=palette,dither=Image.Dither.NONE)
+            if(i==0):
+                file.writelines(GifImagePlugin.getheader(image,info={'loop':0})[0])
+            file.writelines(GifImagePlugin.getdata(image,duration=1000/fps))
+        file.write(b';')
+
+def renderedChunks(pool,clips,window):
+    """
+    (index of the clip,RGB buffers of a chunk) in the order of the clips and of the frames
+    At most window chunks are rendered or waiting to be written at once, whatever the number of clips
+    """
+    pending=deque()
+    for i,(path,job) in enumerate(clips):
+        nFrame=frameCount(job['state'],job['animParameters'],job['sweepParameters'],job['animParameters']['fps'])
+        for start in range(0,nFrame,chunkLen):
+            pending.append((i,pool.submit(renderChunk,job,start,min(start+chunkLen,nFrame))))
+            if(len(pending)>=window):
+                i0,future=pending.popleft()
+                yield i0,future.result()
+    while(pending):
+        i0,future=pending.popleft()
+        yield i0,future.result()
+
+def exportClips(clips,jobs=None):
+    """
+    clips : list of (path,job), job created by makeJob
+    Frames of all the clips are rendered by the same pool of jobs processes, 2 chunks per process at most are in memory
+    """
+    for path,job in clips:
+        if(not(path.endswith('.gif')) and ffmpegCommand(path,0,0,0) is None):
+            raise RuntimeError('ffmpeg is needed to write '+path)
+        waves,nPoint,fragmented,normalize,sweep=generateArgs(job['waveParameters'],job['state'],job['animParameters'],job['ensembleParameters'],job['sweepParameters'],job['gateParameters'])
+        if(job['session'] is None and sweep is None and nPoint>store.storeThreshold):
+            #Written on disk once here, then memory-mapped by every worker
+            store.storedTrajectory(waves,nPoint,fragmented,normalize)
+    workers=jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        for i,chunks in itertools.groupby(renderedChunks(pool,clips,2*workers),key=lambda chunk:chunk[0]):
+            path,job=clips[i]
+            fig=Figure(figsize=job['figsize'],dpi=job['dpi'])
+            size=FigureCanvasAgg(fig).get_width_height()
+            frames=(frame for i,chunk in chunks for frame in chunk)
+            writeClip(path,frames,size,job['animParameters']['fps'])
+
+def exportAnimation(path,wave=None,preset=None,jobState=None,jobAnim=None,jobs=None,figsize=(6.4,4.8),dpi=100):
+    """
+    Export one clip, see makeJob for the parameters
+    """
+    exportClips([(path,makeJob(path,wave,preset,jobState,jobAnim,figsize,dpi))],jobs)
+
+def parseSwitches(parser,value,names,kind):
+    '''{name:enabled} of names from a comma separated list of the enabled ones, None when value is None'''
+    if(value is None):
+        return None
+    enabled=[name for name in value.split(',') if name]
+    for name in enabled:
+        if(name not in names):
+            parser.error('unknown %s %s, choose in %s'%(kind,name,', '.join(names)))
+    return {name:(name in enabled) for name in names}
+
+def parsePresets(parser,names):
+    '''names, parser error for an unknown preset'''
+    for name in names:
+        if(name not in presetParameters):
+            parser.error('unknown preset %s, choose in %s'%(name,', '.join(presetParameters)))
+    return names
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Export animations of the 3D wave without the GUI')
+    parser.add_argument('--preset',action='append',default=[],help='name of a preset, can be repeated')
+    parser.add_argument('--all-presets',action='store_true',help='export every preset')
+    parser.add_argument('--wave',action='append',default=[],help='JSON dictionary of waveParameters, can be repeated')
+    parser.add_argument('--session',action='append',default=[],help='trajectory saved by the GUI (.npy), can be repeated')
+    parser.add_argument('--sweep',nargs=2,action='append',default=[],metavar=('START','END'),help='morph between 2 waves : preset name, current or JSON dictionary of waveParameters, can be repeated')
+    parser.add_argument('--duration',type=float,default=sweepParameters['duration'],help='duration of a sweep (s)')
+    parser.add_argument('--keyframes',type=int,default=sweepParameters['keyframes'],help='trajectories precomputed along a sweep')
+    parser.add_argument('-o','--output',default='.',help='output folder')
+    parser.add_argument('--format',default='mp4',choices=['mp4','gif'])
+    parser.add_argument('--jobs',type=int,default=None,help='number of worker processes')
+    parser.add_argument('--state',default=None,help='comma separated list of enabled states, e.g. vectorTrack,timeTrack')
+    parser.add_argument('--gate',default=gateParameters['pattern'],choices=patterns,help='gating of the fragmented plot (state fragmented)')
+    parser.add_argument('--mask',default=gateParameters['path'],help='file of the boolean mask of the gate mask (.npy or text)')
+    parser.add_argument('--views',default=None,help='comma separated list of 2D views shown next to the 3D axes, e.g. x-t,XY')
+    parser.add_argument('--nPoint',type=int,default=animParameters['nPoint'])
+    parser.add_argument('--nVector',type=int,default=animParameters['nVector'])
+    parser.add_argument('--fps',type=int,default=animParameters['fps'])
+    parser.add_argument('--dpi',type=int,default=100)
+    parser.add_argument('--figsize',type=float,nargs=2,default=(6.4,4.8))
+    args=parser.parse_args(argv)
+
+    jobState=parseSwitches(parser,args.state,list(state),'state')
+    jobAnim={'nPoint':args.nPoint,'nVector':args.nVector,'fps':args.fps}
+    jobGate={'pattern':args.gate,'path':args.mask}
+    if(jobState is not None and jobState['fragmented']):
+        try:
+            makeGate(args.gate,animParameters['fragmentedPlotLen'],animParameters['fragmentedNoPlotLen'],dict(gateParameters,**jobGate))
+        except ValueError as error:
+            parser.error(str(error))
+    jobView=parseSwitches(parser,args.views,viewNames,'view')
+    #Sessions keep their own length
+    sessionAnim={'nVector':args.nVector,'fps':args.fps}
+    presets=parsePresets(parser,list(presetParameters) if args.all_presets else args.preset)
+    os.makedirs(args.output,exist_ok=True)
+    clips=[]
+    for name in presets:
+        path=os.path.join(args.output,name.replace(' ','_')+'.'+args.format)
+        clips.append((path,makeJob(path,preset=name,jobState=jobState,jobAnim=jobAnim,figsize=args.figsize,dpi=args.dpi,jobGate=jobGate,jobView=jobView)))
+    for i,wave in enumerate(args.wave):
+        path=os.path.join(args.output,'wave%d.%s'%(i+1,args.format))
+        clips.append((path,makeJob(path,wave=json.loads(wave),jobState=jobState,jobAnim=jobAnim,figsize=args.figsize,dpi=args.dpi,jobGate=jobGate,jobView=jobView)))
+    for session in args.session:
+        path=os.path.join(args.output,os.path.splitext(os.path.basename(session))[0]+'.'+args.format)
+        clips.append((path,makeJob(path,jobState=jobState,jobAnim=sessionAnim,figsize=args.figsize,dpi=args.dpi,session=session,jobView=jobView)))
+    for start,end in args.sweep:
+        ends=[]
+        for value in (start,end):
+            if(value.startswith('{')):
+                ends.append(json.loads(value))
+            elif(value=='current'):
+                ends.append(value)
+            else:
+                ends.extend(parsePresets(parser,[value]))
+        name='sweep%d'%(len(clips)+1) if type(ends[0])==dict or type(ends[1])==dict else 'sweep_%s_to_%s'%(start.replace(' ','_'),end.replace(' ','_'))
+        path=os.path.join(args.output,name+'.'+args.format)
+        jobSweep={'start':ends[0],'end':ends[1],'duration':args.duration,'keyframes':args.keyframes}
+        clips.append((path,makeJob(path,jobState=dict(jobState or {},sweep=True),jobAnim=jobAnim,figsize=args.figsize,dpi=args.dpi,jobSweep=jobSweep,jobGate=jobGate,jobView=jobView)))
+    if(clips==[]):
+        parser.error('nothing to export, use --preset, --all-presets, --wave, --session or --sweep')
+    exportClips(clips,args.jobs)
+    for path,job in clips:
+        print(path)
+
+if __name__=='__main__':
+    main()
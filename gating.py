@@ -0,0 +1,162 @@
+"""
+Gating of the fragmented plot : which samples of the curve are visible
+A gate is a tuple (hashable, saved as JSON with the sessions) :
+    ('periodic',plotLen,noPlotLen) : plotLen samples on then noPlotLen samples off, only complete periods
+    ('pulses',width,gap,count,pause) : bursts of count pulses of width samples separated by gap samples, then pause samples off
+    ('random',keep,runLen,seed) : runs of runLen samples, each one visible with the probability keep
+    ('mask',path,mtime) : boolean array of a file (.npy or text), repeated when it is shorter than the curve,
+        mtime (modification time of the file) regenerates the trajectories cached with the gate when the file changes
+The visible samples are held as segments (index ranges) with their values only, see Segments
+"""
+import os
+import numpy as np
+
+patterns=['periodic','pulses','random','mask']
+
+def makeGate(pattern,plotLen,noPlotLen,gateParameters):
+    """
+    Gate of the pattern, plotLen and noPlotLen are the lengths of the pulses (or of the random runs) and of the gaps
+    ValueError when the gate cannot be computed (lengths lower than 1, mask file missing or empty)
+    """
+    plotLen,noPlotLen=int(plotLen),int(noPlotLen)
+    if(plotLen<1 or noPlotLen<0):
+        raise ValueError('the length of plot must be at least 1 and the length of no plot positive')
+    if(pattern=='periodic'):
+        return ('periodic',plotLen,noPlotLen)
+    if(pattern=='pulses'):
+        count,pause=int(gateParameters['count']),int(gateParameters['pause'])
+        if(count<1 or pause<0):
+            raise ValueError('the count of pulses must be at least 1 and the pause positive')
+        return ('pulses',plotLen,noPlotLen,count,pause)
+    if(pattern=='random'):
+        return ('random',float(gateParameters['keep']),plotLen,int(gateParameters['seed']))
+    if(pattern=='mask'):
+        path=gateParameters['path']
+        if(not(os.path.isfile(path))):
+            raise ValueError('mask file not found : '+repr(path))
+        if(readMask(path).size==0):
+            raise ValueError('mask file empty : '+repr(path))
+        return ('mask',path,os.path.getmtime(path))
+    raise ValueError('unknown gating pattern '+pattern)
+
+def gateSegments(gate,nPoint):
+    """
+    (starts,stops) of the visible samples of a curve of nPoint samples, sorted and disjoint
+    gate : see the module, (plotLen,noPlotLen) is the periodic gate (sessions saved before the gating patterns)
+    """
+    if(type(gate[0])!=str):
+        gate=('periodic',*gate)
+    pattern=gate[0]
+    if(pattern=='periodic'):
+        plotLen,noPlotLen=gate[1:]
+        period=plotLen+noPlotLen
+        starts=np.arange(0,nPoint//period*period,period)
+        return mergeSegments(starts,starts+plotLen)
+    if(pattern=='pulses'):
+        width,gap,count,pause=gate[1:]
+        burst=count*(width+gap)+pause
+        starts=(np.arange(-(-nPoint//burst))[:,None]*burst+np.arange(count)*(width+gap)).ravel()
+        starts=starts[starts<nPoint]
+        return mergeSegments(starts,np.minimum(starts+width,nPoint))
+    if(pattern=='random'):
+        keep,runLen,seed=gate[1:]
+        kept=np.random.default_rng(seed).random(-(-nPoint//runLen))<keep
+        starts,stops=maskSegments(kept)
+        return starts*runLen,np.minimum(stops*runLen,nPoint)
+    if(pattern=='mask'):
+        mask=readMask(gate[1])
+        if(mask.size==0):
+            raise ValueError('mask file empty : '+repr(gate[1]))
+        starts,stops=maskSegments(mask[:nPoint])
+        #Segments of the mask repeated until nPoint
+        shift=np.arange(0,nPoint,len(mask))[:,None]
+        starts,stops=(starts+shift).ravel(),np.minimum((stops+shift).ravel(),nPoint)
+        visible=starts<stops
+        #A segment at the end of the mask continues with the one at its beginning
+        return mergeSegments(starts[visible],stops[visible])
+    raise ValueError('unknown gating pattern '+str(pattern))
+
+def readMask(path):
+    '''Flat boolean array of a mask file (.npy or text, any shape)'''
+    mask=np.load(path,mmap_mode='r') if path.endswith('.npy') else np.loadtxt(path,ndmin=1)
+    return np.asarray(mask,dtype=bool).ravel()
+
+def mergeSegments(starts,stops):
+    '''Segments which touch (stop of one is the start of the next) joined into one'''
+    if(len(starts)==0):
+        return starts,stops
+    joined=starts[1:]==stops[:-1]
+    return starts[np.append(True,~joined)],stops[np.append(~joined,True)]
+
+def maskSegments(mask):
+    '''(starts,stops) of the runs of True of a boolean array'''
+    edges=np.diff(mask.astype(np.int8),prepend=0,append=0)
+    return np.flatnonzero(edges==1),np.flatnonzero(edges==-1)
+
+def gateMask(gate,nPoint,start=0,length=None):
+    """
+    Boolean mask of the visible samples range(start,start+length) (until nPoint by default)
+    """
+    if(length is None):
+        length=nPoint-start
+    starts,stops=gateSegments(gate,nPoint)
+    #Only the segments which overlap the range
+    first,last=np.searchsorted(stops,start,side='right'),np.searchsorted(starts,start+length)
+    starts,stops=starts[first:last],stops[first:last]
+    #+1 at the start of each segment, -1 at its end
+    count=np.zeros(length+1,dtype=np.int32)
+    np.add.at(count,np.clip(starts-start,0,length),1)
+    np.add.at(count,np.clip(stops-start,0,length),-1)
+    return np.cumsum(count[:-1])>0
+
+class Segments:
+    """
+    Visible samples of a gated curve of nPoint samples, segment k covers the samples range(starts[k],stops[k])
+    values : (3,nVisible+nSegment) samples of the segments one after the other, each segment followed by a column of NaN
+    so that a line drawn from values is broken between the segments, positions[k] is the column of the sample starts[k]
+    """
+    def __init__(self,starts,stops,nPoint):
+        self.starts=starts
+        self.stops=stops
+        self.nPoint=nPoint
+        lengths=stops-starts
+        self.positions=np.cumsum(lengths+1)-lengths-1
+        self.values=np.full((3,lengths.sum()+len(lengths)),np.nan)
+
+    def indices(self):
+        '''Indices of the visible samples'''
+        lengths=self.stops-self.starts
+        return np.arange(lengths.sum())+np.repeat(self.starts-np.cumsum(lengths)+lengths,lengths)
+
+    def columns(self):
+        '''Columns of values of the visible samples'''
+        lengths=self.stops-self.starts
+        return np.arange(lengths.sum())+np.repeat(np.arange(len(lengths)),lengths)
+
+    def times(self):
+        '''(nVisible+nSegment,) index of the sample of each column of values, NaN between the segments'''
+        t=np.full(self.values.shape[1],np.nan)
+        t[self.columns()]=self.indices()
+        return t
+
+    def at(self,t):
+        '''Sample t, None when it is not visible'''
+        k=np.searchsorted(self.stops,t,side='right')
+        if(k<len(self.starts) and self.starts[k]<=t):
+            return self.values[:,self.positions[k]+t-self.starts[k]]
+        return None
+
+    def prefix(self,stop):
+        '''View of the values of the samples [0,stop['''
+        k=np.searchsorted(self.starts,stop)
+        if(k==0):
+            return self.values[:,:0]
+        return self.values[:,:self.positions[k-1]+min(stop,self.stops[k-1])-self.starts[k-1]]
+
+    def singles(self):
+        '''(3,n) samples of the segments of one sample, a line does not show them'''
+        return self.values[:,self.positions[self.stops-self.starts==1]]
+
+    def pieces(self):
+        '''(length,3) views of the segments, for a Line3DCollection'''
+        return [self.values[:,p:p+n].T for p,n in zip(self.positions,self.stops-self.starts)]
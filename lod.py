@@ -0,0 +1,155 @@
+"""
+Levels of detail of a curve : multi-resolution pyramid built once per trajectory
+The level drawn is the coarsest one whose error stays under half a pixel
+"""
+import numpy as np
+
+relTolerance=2**-12 #Error of the finest decimated level, relative to the extent of the curve
+minPoints=16 #No coarser level once a level keeps less points
+
+def segmentDistance(start,points,end):
+    '''Distance between the points (3,k) and the segments [start,end] (3,k)'''
+    chord=end-start
+    points=points-start
+    length=(chord*chord).sum(axis=0)
+    t=(points*chord).sum(axis=0)/np.where(length>0,length,1)
+    np.clip(t,0,1,out=t)
+    points-=t*chord
+    return np.sqrt((points*points).sum(axis=0))
+
+def chordError(curve,indices,stride):
+    """
+    Maximum distance between the samples indices (sorted, multiples of stride included) of each block of stride samples and the chord of the block
+    """
+    n=curve.shape[1]
+    nBlock=-(-(n-1)//stride)
+    block=np.minimum(indices//stride,nBlock-1)
+    error=segmentDistance(curve[:,block*stride],curve[:,indices],curve[:,np.minimum(block*stride+stride,n-1)])
+    return np.maximum.reduceat(error,np.searchsorted(block,np.arange(nBlock)))
+
+def middleGood(samples,budget):
+    """
+    Odd samples (3,k) of a level within budget of the chord between their neighbours (even samples)
+    """
+    start,middle,end=samples[:,0:-2:2],samples[:,1:-1:2],samples[:,2::2]
+    #Distance to the middle of the chord : bound of the distance to the chord, cheaper, measured exactly only above budget
+    bend=start+end
+    bend-=middle
+    bend-=middle
+    bend*=bend
+    good=bend.sum(axis=0)<=4*budget*budget
+    far=np.flatnonzero(~good)
+    if(len(far)>len(good)//4):
+        #Mostly far (noisy or aliased curves) : all measured, no gather
+        return segmentDistance(start,middle,end)<=budget
+    if(len(far)):
+        good[far]=segmentDistance(start[:,far],middle[:,far],end[:,far])<=budget
+    return good
+
+class CurvePyramid:
+    """
+    Level k keeps the samples of curve (3,n) needed for an error lower than tolerance*2**(k-1) :
+    blocks of 2**k samples close enough to their chord are reduced to their ends, the others keep the samples of level k-1
+    step : the pyramid is built from one sample every step (bounded memory for curves on disk),
+    the error is then measured against these samples only, indices stay the ones of curve
+    """
+    def __init__(self,curve,tolerance=None,step=1):
+        self.curve=curve
+        if(step>1):
+            curve=np.array(curve[:,::step],dtype=float)
+        n=curve.shape[1]
+        extent=max(curve.max(),-curve.min()) if n else 0
+        self.tolerance=(extent or 1)*relTolerance if tolerance is None else tolerance
+        self.indices=[np.arange(n)]
+        self.levels=[curve]
+        stride=2
+        while(stride<n and len(self.indices[-1])>minPoints):
+            previous,samples=self.indices[-1],self.levels[-1]
+            #Samples dropped before are within the error of level k-1 from the polyline of level k-1, so only
+            #the samples of level k-1 are measured, against the remaining error
+            budget=self.tolerance*stride/2-(self.tolerance*stride/4 if stride>2 else 0)
+            if(len(previous)==-(-(n-1)//(stride//2))+1):
+                #Level k-1 only keeps the ends of its blocks (smooth or long curves) : its odd samples are the middles of the blocks
+                good=middleGood(samples,budget)
+                if(good.all()):
+                    #Even samples and the last one, sliced instead of gathered
+                    self.indices.append(np.append(previous[:-1:2],previous[-1]))
+                    self.levels.append(np.append(samples[:,:-1:2],samples[:,-1:],axis=1))
+                    stride*=2
+                    continue
+                keep=np.ones(len(previous),dtype=bool)
+                keep[1:-1:2]=~good
+            else:
+                good=chordError(curve,previous,stride)<=budget
+                keep=(previous%stride==0)|~good[np.minimum(previous//stride,len(good)-1)]
+                keep[-1]=True
+            if(keep.all()):
+                #No sample dropped : the coarser levels would only drop a few samples, not worth their memory and time
+                break
+            self.indices.append(previous[keep])
+            self.levels.append(samples[:,keep])
+            stride*=2
+        if(step>1):
+            self.indices=[indices*step for indices in self.indices]
+        #Level 0 is curve itself when step is 1, left as it is
+        for array in self.indices+self.levels[1 if step==1 else 0:]:
+            array.setflags(write=False)
+
+    def level(self,error):
+        '''Coarsest level whose error is lower than error (data units)'''
+        if(error<self.tolerance):
+            return 0
+        return int(min(np.log2(error/self.tolerance)+1,len(self.levels)-1))
+
+    def prefix(self,level,stop):
+        '''Samples [0,stop[ of the curve at level, ends exactly at the sample stop-1'''
+        indices=self.indices[level]
+        k=np.searchsorted(indices,stop)
+        if(k==0 or indices[k-1]==stop-1):
+            return self.levels[level][:,:k]
+        return np.concatenate((self.levels[level][:,:k],self.curve[:,stop-1:stop]),axis=1)
+
+class GatedOverview:
+    """
+    Level of detail of a gated curve (3,n) with NaN for the samples off (stored on disk), same interface as CurvePyramid
+    with one level of at most length columns : each visible segment range(starts[k],stops[k]) keeps its ends and one sample
+    every step, a column of NaN breaks the line between the segments, indices is the time of each column (NaN between them)
+    Beyond length/6 segments only one segment every few is kept (dashes thinner than a pixel)
+    """
+    def __init__(self,curve,starts,stops,length):
+        self.curve=curve
+        self.tolerance=0
+        #Up to 3 columns per segment (first and last samples, NaN) and 1 more per step : length/2 for each
+        every=max(1,-(-6*len(starts)//length))
+        self.starts,self.stops=starts[::every],stops[::every]
+        lengths=self.stops-self.starts
+        step=max(1,-(-2*int(lengths.sum())//length))
+        #Samples start, start+step... of each segment then its last one
+        counts=-(-lengths//step)
+        first=np.cumsum(counts)-counts
+        grid=np.repeat(self.starts,counts)+(np.arange(counts.sum())-np.repeat(first,counts))*step
+        last=self.stops-1
+        self.samples=np.sort(np.concatenate((grid,last[(lengths-1)%step!=0])))
+        self.segment=np.searchsorted(self.starts,self.samples,side='right')-1
+        self.columns=np.arange(len(self.samples))+self.segment
+        level=np.full((3,len(self.samples)+len(self.starts)),np.nan)
+        level[:,self.columns]=curve[:,self.samples]
+        times=np.full(level.shape[1],np.nan)
+        times[self.columns]=self.samples
+        self.levels=[level]
+        self.indices=[times]
+        for array in self.levels+self.indices:
+            array.setflags(write=False)
+
+    def level(self,error):
+        return 0
+
+    def prefix(self,level,stop):
+        '''Columns of the samples [0,stop[, ends exactly at the sample stop-1 when it is visible'''
+        k=np.searchsorted(self.samples,stop)
+        if(k==0):
+            return self.levels[0][:,:0]
+        end=self.columns[k-1]+1
+        if(self.samples[k-1]==stop-1 or stop>self.stops[self.segment[k-1]]):
+            return self.levels[0][:,:end]
+        return np.concatenate((self.levels[0][:,:end],self.curve[:,stop-1:stop]),axis=1)
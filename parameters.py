@@ -0,0 +1,143 @@
+"""
+Global parameters of the animation, shared by the GUI and the headless tools
+"""
+import itertools
+import numpy as np
+from trajectory import sweepWaves
+
+_clock=itertools.count(1) #Versions shared by every Parameters, a version is never given twice
+
+class Parameters(dict):
+    """
+    Observable dictionary of parameters : only real changes (value different from the current one) are recorded
+    versions[name] : version of the last change of name, version : the last of them (0 : never changed)
+    observers : functions (parameters,name,value) called after each change
+    Copies (dict(parameters)) are plain dictionaries, for threads, processes and JSON
+    """
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.versions=dict.fromkeys(self,0)
+        self.version=0
+        self.observers=[]
+
+    def __setitem__(self,name,value):
+        if(name in self and self[name]==value):
+            return
+        super().__setitem__(name,value)
+        self.version=self.versions[name]=next(_clock)
+        for observer in self.observers:
+            observer(self,name,value)
+
+    def update(self,*args,**kwargs):
+        for name,value in dict(*args,**kwargs).items():
+            self[name]=value
+
+    def __reduce__(self):
+        #Pickled without the observers (processes of the export)
+        return (Parameters,(dict(self),))
+
+    def changed(self,version,names=None):
+        '''True if one of names (all by default) changed after version'''
+        if(names is None):
+            return self.version>version
+        return any(self.versions.get(name,0)>version for name in names)
+
+def observable(parameters):
+    '''parameters itself if it is a Parameters, else an observable copy'''
+    return parameters if isinstance(parameters,Parameters) else Parameters(parameters)
+
+## Global Variables
+#Parameters of the GUI, the canvas observes them (see canvas.MplCanvas.parametersChanged)
+
+#Animation parameters
+animParameters=Parameters({'nPoint':360,'interval':30,'repeat':True,'repeat_delay':0,'nVector':1,'fragmentedNoPlotLen':5,'fragmentedPlotLen':10,'fps':60,'writer':'imagemagick','blit':True}) #Warning : nPoint>nVector !
+
+#dictionary with different sate : {'name' (str):initial_state(bool)}
+state=Parameters({'vector':True,'timeTrack':False,'vectorTrack':False,'static':True,'autoscale':True,'fragmented':False,'profiler':False,'ensemble':False,'stream':False,'sweep':False})
+
+#Frequency & amplitude parameters for each axis, updated thanks to the GUI:
+parametersName=['frequency x','frequency y','frequency z','amplitude x','amplitude y','amplitude z','phase x','phase y','phase z','offset x','offset y','offset z']
+waveParameters=Parameters({'frequency x':2,'frequency y':2,'frequency z':0,'amplitude x':1,'amplitude y':1,'amplitude z':1,'phase x':0,'phase y':np.pi/2,'phase z':0,'offset x':0,'offset y':0,'offset z':0})
+
+#Preset rules : {'name of the figure' : [fx,fy,fz,Ax,Ay,Az,Phix,Phiy,Phiz,offsetx,offsety,offsetz]}
+presetParameters={'Flat Disk':['frequency x','frequency x',0,'amplitude x','amplitude x',0,0,np.pi/2,0,0,0,0],'Wide Cone':['frequency x','frequency x',0,'amplitude x','amplitude y','amplitude z',0,'phase y',0,0,0,0],'Small Cone':['frequency x','frequency x',0,'amplitude x','amplitude x','amplitude z',0,'phase y',0,0,0,0],'Permanent Magnet':[0,0,0,'amplitude x','amplitude y','amplitude z','phase x','phase y','phase z',0,0,0],'Pendulum':['frequency x','frequency x',0,'amplitude x','amplitude y','amplitude z',0,0,0,0,0,0],'Swinging Rotation':['frequency x','frequency x','frequency z','amplitude x','amplitude x','amplitude z',0,np.pi/2,0,0,0,0],'Alternating':[0,0,'frequency z',0,0,'amplitude z',0,0,0,0,0,0],'Alternating + Constant':[0,0,'frequency z',0,0,'amplitude z',0,0,0,0,0,'offset z'],'Free Mode':parametersName}
+
+#Only values for parameters independant and can be changed
+wavePresetValue={'Flat Disk':[None]*12,'Wide Cone':[1,2,2,3,np.pi/2],'Small Cone':[1,1,10,np.pi/2],'Permanent Magnet':[1,2,3,0,0,0],'Pendulum':[1,1,2,1],'Swinging Rotation':[1,10,5,1],'Alternating':[3,2],'Alternating + Constant':[3,4,2],'Free Mode':[None]*12}
+
+#Ensemble of waves superposed : the parameter goes from start to stop in n waves, 'presets' for one wave per preset
+#normalize : the superposition is divided by n
+ensembleParameters=Parameters({'parameter':'phase y','start':0,'stop':np.pi,'n':8,'normalize':True})
+
+#Gating of the fragmented plot (see gating.py), pattern in 'periodic', 'pulses', 'random', 'mask'
+#pulses : bursts of count pulses (fragmentedPlotLen samples, separated by fragmentedNoPlotLen samples) then pause samples off
+#random : runs of fragmentedPlotLen samples visible with the probability keep, mask : boolean array of the file path
+gateParameters=Parameters({'pattern':'periodic','count':3,'pause':40,'keep':0.5,'seed':0,'path':''})
+
+#2D views shown next to the 3D axes (see views.py) : a component along the time or a projection on a plane
+viewParameters=Parameters({'x-t':False,'y-t':False,'z-t':False,'XY':False,'XZ':False,'YZ':False})
+
+#Streaming mode : samples read from source ('synthetic', 'file', 'socket', 'pipe'), see sources.py
+#rate : samples per second of the synthetic source and of the file replay, capacity : samples displayed
+#displayRate : samples per second kept in the display buffer, faster input is decimated
+streamParameters=Parameters({'source':'synthetic','path':'','port':5005,'rate':360,'capacity':600,'displayRate':600})
+
+#Sweep : morph from the wave start to the wave end in duration seconds, 'current' (waveParameters), a preset name or a partial waveParameters
+#keyframes : trajectories precomputed along the sweep, interpolated in between, pingpong : back to start after end
+sweepParameters=Parameters({'start':'current','end':'Wide Cone','duration':5,'keyframes':30,'pingpong':True})
+
+def presetFree(presetName):
+    """
+    Independent parameters of the preset (the spin boxes that can be edited in the GUI), in the order of wavePresetValue
+    """
+    return [name for name,rule in zip(parametersName,presetParameters[presetName]) if type(rule)==str and rule==name]
+
+def presetWave(presetName,values=None,base=None,overrides=None):
+    """
+    Resolve the rules of presetParameters into a waveParameters dictionary, same result as the preset list of the GUI
+    values : values of the independent parameters, wavePresetValue[presetName] by default (None keeps the base value)
+    base : waveParameters used for the values not set by the preset, waveParameters by default
+    overrides : {name:value} of independent parameters set after values, the parameters linked to them follow
+    """
+    if(presetName not in presetParameters):
+        raise ValueError('unknown preset %s, choose in %s'%(presetName,', '.join(presetParameters)))
+    preset=presetParameters[presetName]
+    if(values is None):
+        values=wavePresetValue[presetName]
+    wave=dict(waveParameters if base is None else base)
+    #Independent parameters first
+    for name,value in zip(presetFree(presetName),values):
+        if(value!=None):
+            wave[name]=value
+    for name,value in (overrides or {}).items():
+        if(name not in parametersName):
+            raise ValueError('unknown parameter %s, choose in %s'%(name,', '.join(parametersName)))
+        if(name not in presetFree(presetName)):
+            raise ValueError('%s is set by the preset %s, free parameters : %s'%(name,presetName,', '.join(presetFree(presetName))))
+        wave[name]=value
+    #Then parameters linked to another one or fixed
+    for name,rule in zip(parametersName,preset):
+        wave[name]=wave[rule] if type(rule)==str else rule
+    return wave
+
+def ensembleWaves(waveParameters,ensembleParameters):
+    """
+    List of the waveParameters of the ensemble built around waveParameters
+    """
+    if(ensembleParameters['parameter']=='presets'):
+        return [presetWave(name,base=waveParameters) for name in presetParameters]
+    return sweepWaves(waveParameters,ensembleParameters['parameter'],ensembleParameters['start'],ensembleParameters['stop'],ensembleParameters['n'])
+
+def sweepEnds(waveParameters,sweepParameters):
+    """
+    waveParameters at the start and at the end of the sweep
+    """
+    ends=[]
+    for end in (sweepParameters['start'],sweepParameters['end']):
+        if(type(end)==dict):
+            ends.append(dict(waveParameters,**end))
+        elif(end=='current'):
+            ends.append(dict(waveParameters))
+        else:
+            ends.append(presetWave(end,base=waveParameters))
+    return ends
@@ -0,0 +1,103 @@
+"""
+Instrumentation of the animation : per-stage timers and frame timing
+Samples are kept in bounded buffers and can be exported to CSV or JSON
+"""
+import csv
+import json
+import time
+import numpy as np
+from collections import deque
+
+class _Stage:
+    def __init__(self,profiler,name):
+        self.profiler=profiler
+        self.name=name
+
+    def __enter__(self):
+        self.start=time.perf_counter()
+
+    def __exit__(self,*exc):
+        #deque.append is atomic, stages can be timed from the worker thread
+        self.profiler.trace.append((self.name,self.start,time.perf_counter()-self.start))
+
+class _NoStage:
+    def __enter__(self):
+        pass
+
+    def __exit__(self,*exc):
+        pass
+
+_noStage=_NoStage()
+
+class Profiler:
+    """
+    interval : target time between two frames (ms), a frame later than 1.5 interval counts as dropped
+    maxLen : number of samples kept for the stages and for the frames
+    """
+    def __init__(self,interval,maxLen=10000):
+        self.interval=interval/1000
+        self.enabled=False
+        self.trace=deque(maxlen=maxLen) #(stage,start,duration) in s
+        self.frames=deque(maxlen=maxLen) #(start,time since the previous frame) in s
+        self.lastFrame=None
+
+    def stage(self,name):
+        '''with profiler.stage(name): time the block, does nothing when disabled'''
+        if(self.enabled):
+            return _Stage(self,name)
+        return _noStage
+
+    def frame(self):
+        '''Called once per frame'''
+        if(not(self.enabled)):
+            return
+        now=time.perf_counter()
+        if(self.lastFrame is not None):
+            self.frames.append((now,now-self.lastFrame))
+        self.lastFrame=now
+
+    def reset(self):
+        self.trace.clear()
+        self.frames.clear()
+        self.lastFrame=None
+
+    def summary(self,last=None):
+        '''Statistics in ms of the frames and of each stage, last : only the last frames (and their window of time)'''
+        frames=list(self.frames)[-last:] if last else list(self.frames)
+        result={'frames':len(frames),'fps':0,'dropped':0,'frame p50':0,'frame p99':0,'stages':{}}
+        since=None
+        if(frames):
+            duration=np.array([d for t,d in frames])
+            since=frames[0][0]-duration[0]
+            result['fps']=len(duration)/duration.sum()
+            result['dropped']=int(np.maximum(np.round(duration/self.interval)-1,0)[duration>1.5*self.interval].sum())
+            result['frame p50'],result['frame p99']=1000*np.percentile(duration,[50,99])
+        stages={}
+        for name,start,duration in list(self.trace):
+            if(since is None or start>=since):
+                stages.setdefault(name,[]).append(duration)
+        for name in stages:
+            duration=1000*np.array(stages[name])
+            result['stages'][name]={'count':len(duration),'mean':duration.mean(),'p50':np.percentile(duration,50),'p99':np.percentile(duration,99)}
+        return result
+
+    def overlayText(self,last=100):
+        s=self.summary(last)
+        lines=['%.1f fps  dropped %d  frame p50 %.1f ms  p99 %.1f ms'%(s['fps'],s['dropped'],s['frame p50'],s['frame p99'])]
+        for name,stage in s['stages'].items():
+            lines.append('%-16s p50 %6.2f ms  p99 %6.2f ms'%(name,stage['p50'],stage['p99']))
+        return '\n'.join(lines)
+
+    def export(self,path):
+        '''Trace of all the samples kept, CSV (one row per sample) or JSON (with the summary)'''
+        if(path.endswith('.json')):
+            with open(path,'w') as f:
+                json.dump({'summary':self.summary(),'frames':[{'start':t,'duration':d} for t,d in self.frames],'stages':[{'stage':n,'start':t,'duration':d} for n,t,d in self.trace]},f,indent=1)
+        else:
+            with open(path,'w',newline='') as f:
+                writer=csv.writer(f)
+                writer.writerow(['stage','start (s)','duration (s)'])
+                for t,d in self.frames:
+                    writer.writerow(['frame',t,d])
+                for row in self.trace:
+                    writer.writerow(row)
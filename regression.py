@@ -0,0 +1,192 @@
+"""
+Golden-image regression of the rendered frames, headless (Agg backend)
+Chosen frames of every preset in every combination of states are rendered across a process pool and compared
+with the PNG stored in the golden folder : a frame fails when too many pixels differ by more than a tolerance
+after a small blur (anti-aliasing and one pixel shifts are not regressions)
+Inputs (job, frames, source of the rendering modules, versions of numpy and matplotlib) are hashed, a case whose
+hash is the one of its golden images or of its last successful comparison is skipped without rendering
+
+usage : python regression.py --update     (golden images of the cases changed)
+        python regression.py              (exit 1 when a frame differs, images of the failures in regression/)
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import numpy as np
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.image import imread,imsave
+from parameters import state,presetParameters,presetWave
+from export import HeadlessScene,makeJob,parsePresets
+
+renderModules=['scene.py','artists.py','trajectory.py','gating.py','lod.py','views.py','store.py','parameters.py','export.py'] #Source hashed with the cases
+excludedStates=['stream','profiler'] #Live data and timings, not reproducible
+stateNames=[name for name in state if name not in excludedStates] #States combined by default, every reproducible one
+
+def codeHash():
+    '''Hash of the source of the modules which draw the frames and of the libraries'''
+    digest=hashlib.sha1((np.__version__+matplotlib.__version__).encode())
+    folder=os.path.dirname(os.path.abspath(__file__))
+    for name in renderModules:
+        with open(os.path.join(folder,name),'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def caseHash(job,frames,code):
+    '''Hash of everything rendered by a case (the name of the job is only the place of the files)'''
+    inputs=json.dumps({key:value for key,value in job.items() if key!='name'},sort_keys=True,default=str)
+    return hashlib.sha1((inputs+str(frames)+code).encode()).hexdigest()
+
+def makeCases(presets,names,frames,jobAnim=None,figsize=(3.2,2.4),dpi=80):
+    '''(case name,job,frames) of every preset in every combination of the states names'''
+    cases=[]
+    for preset in presets:
+        for enabled in itertools.product([False,True],repeat=len(names)):
+            jobState=dict(zip(names,enabled))
+            name='%s-%s'%(preset.replace(' ','_'),'+'.join(key for key in names if jobState[key]) or 'none')
+            cases.append((name,makeJob(name,wave=presetWave(preset),jobState=jobState,jobAnim=jobAnim,figsize=figsize,dpi=dpi),frames))
+    return cases
+
+def boxBlur(image,radius):
+    '''Mean over the (2*radius+1)^2 neighbourhood of each pixel of a (h,w,c) image'''
+    if(radius==0):
+        return image.astype(float)
+    height,width=image.shape[:2]
+    padded=np.pad(image.astype(float),((radius,radius),(radius,radius),(0,0)),mode='edge')
+    out=np.zeros((height,width,image.shape[2]))
+    for dy in range(2*radius+1):
+        for dx in range(2*radius+1):
+            out+=padded[dy:dy+height,dx:dx+width]
+    return out/(2*radius+1)**2
+
+def imageDiff(image,golden,tolerance=16,blur=1):
+    """
+    Fraction of the pixels of 2 (h,w,3) uint8 images whose channels differ by more than tolerance once blurred,
+    and the boolean map of these pixels, 1 when the sizes are different
+    """
+    if(image.shape!=golden.shape):
+        return 1.0,None
+    different=np.abs(boxBlur(image,blur)-boxBlur(golden,blur)).max(axis=2)>tolerance
+    return different.mean(),different
+
+def readImage(path):
+    '''(h,w,3) uint8 pixels of a PNG'''
+    return np.round(imread(path)[:,:,:3]*255).astype(np.uint8)
+
+def checkCase(name,job,frames,golden,output,update,tolerance,blur,maxFraction):
+    """
+    Render the frames of a case then write them as golden images (update) or compare them with the golden images
+    Return [(frame name,status,fraction of pixels different)], images of the failures and their diff are written in output
+    """
+    scene=HeadlessScene(job)
+    width,height=scene.canvas.get_width_height()
+    results=[]
+    for frame in sorted(frames):
+        image=np.frombuffer(scene.render(frame),dtype=np.uint8).reshape(height,width,3)
+        frameName='%s-f%04d'%(name,frame)
+        path=os.path.join(golden,frameName+'.png')
+        if(update):
+            imsave(path,image)
+            results.append((frameName,'updated',0.0))
+            continue
+        if(not(os.path.exists(path))):
+            results.append((frameName,'missing',1.0))
+            continue
+        reference=readImage(path)
+        fraction,different=imageDiff(image,reference,tolerance,blur)
+        if(fraction<=maxFraction):
+            results.append((frameName,'passed',fraction))
+            continue
+        results.append((frameName,'failed',fraction))
+        imsave(os.path.join(output,frameName+'.png'),image)
+        if(different is not None):
+            #Golden image faded, pixels different in red
+            diff=(reference//3+170).astype(np.uint8)
+            diff[different]=(255,0,0)
+            imsave(os.path.join(output,frameName+'-diff.png'),diff)
+    return results
+
+def loadIndex(path):
+    if(os.path.exists(path)):
+        with open(path) as file:
+            return json.load(file)
+    return {}
+
+def saveIndex(path,index):
+    with open(path,'w') as file:
+        json.dump(index,file,indent=1,sort_keys=True)
+
+def runCases(cases,golden,output,update=False,force=False,jobs=None,tolerance=16,blur=1,maxFraction=0.0004):
+    """
+    cases : list of (name,job,frames), see makeCases
+    golden/index.json : hash of the cases of the golden images, golden/passed.json : hash of the last successful comparisons
+    Return [(frame name,status,fraction)], status in updated, passed, failed, missing and skipped
+    """
+    os.makedirs(golden,exist_ok=True)
+    os.makedirs(output,exist_ok=True)
+    index=loadIndex(os.path.join(golden,'index.json'))
+    passed=loadIndex(os.path.join(golden,'passed.json'))
+    code=codeHash()
+    results=[]
+    with ProcessPoolExecutor(jobs) as pool:
+        futures=[]
+        for name,job,frames in cases:
+            key=caseHash(job,frames,code)
+            if(not(force) and key in (index.get(name),passed.get(name))):
+                results+=[('%s-f%04d'%(name,frame),'skipped',0.0) for frame in sorted(frames)]
+                continue
+            futures.append((name,key,pool.submit(checkCase,name,job,frames,golden,output,update,tolerance,blur,maxFraction)))
+        for name,key,future in futures:
+            caseResults=future.result()
+            results+=caseResults
+            if(update):
+                index[name]=key
+                passed.pop(name,None)
+            elif(all(status=='passed' for frameName,status,fraction in caseResults)):
+                passed[name]=key
+            else:
+                passed.pop(name,None)
+    saveIndex(os.path.join(golden,'index.json'),index)
+    saveIndex(os.path.join(golden,'passed.json'),passed)
+    return results
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Golden-image regression of the frames of the 3D wave visualisation')
+    parser.add_argument('--golden',default='golden',help='folder of the golden images')
+    parser.add_argument('-o','--output',default='regression',help='folder of the images of the failures')
+    parser.add_argument('--update',action='store_true',help='write the golden images of the cases changed')
+    parser.add_argument('--force',action='store_true',help='render every case, even unchanged ones')
+    parser.add_argument('--preset',action='append',default=None,help='preset, can be repeated (all by default)')
+    parser.add_argument('--states',default=','.join(stateNames),help='comma separated list of the states combined')
+    parser.add_argument('--frames',default='0,120',help='comma separated list of the frames compared')
+    parser.add_argument('--nVector',type=int,default=20,help='length of the vector track')
+    parser.add_argument('--tolerance',type=int,default=16,help='difference of a channel (0-255) counted as a different pixel')
+    parser.add_argument('--blur',type=int,default=1,help='radius of the blur applied before the comparison')
+    parser.add_argument('--max-fraction',type=float,default=0.0004,help='fraction of different pixels allowed in a frame (about 20 pixels of the default size)')
+    parser.add_argument('--jobs',type=int,default=None,help='number of worker processes')
+    parser.add_argument('--dpi',type=int,default=80)
+    parser.add_argument('--figsize',type=float,nargs=2,default=(3.2,2.4))
+    args=parser.parse_args(argv)
+
+    presets=parsePresets(parser,args.preset or list(presetParameters))
+    names=[name for name in args.states.split(',') if name]
+    for name in names:
+        if(name not in state or name in excludedStates):
+            parser.error('unknown state %s, choose in %s'%(name,', '.join(key for key in state if key not in excludedStates)))
+    frames=[int(frame) for frame in args.frames.split(',')]
+    cases=makeCases(presets,names,frames,{'nVector':args.nVector},args.figsize,args.dpi)
+    results=runCases(cases,args.golden,args.output,args.update,args.force,args.jobs,args.tolerance,args.blur,args.max_fraction)
+    counts={}
+    for frameName,status,fraction in results:
+        counts[status]=counts.get(status,0)+1
+        if(status in ('failed','missing')):
+            print('%-7s %-60s %.4f'%(status.upper(),frameName,fraction))
+    print('%d frames : %s'%(len(results),', '.join('%d %s'%(count,status) for status,count in sorted(counts.items()))))
+    if(counts.get('failed',0)+counts.get('missing',0)>0):
+        sys.exit(1)
+
+if __name__=='__main__':
+    main()
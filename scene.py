@@ -0,0 +1,441 @@
+"""
+3D scene of the animation : axes, artists and plot functions without any GUI
+Used by the canvas of the GUI and by the headless export
+"""
+import numpy as np
+from trajectory import trajectory,gatedTrajectory,ensembleTrajectory,sweepTrajectory,blendKeyframes,cached,waveKey
+from lod import CurvePyramid
+import store
+from artists import VectorTrail,EnsembleCurves,GatedCurve
+from views import viewNames,makeView
+import gating
+from profiler import Profiler
+import parameters
+
+sweepBudget=2**25 #Values of the keyframes of a sweep held in RAM
+
+def generate(waves,nPoint,fragmented,normalize=True,sweep=None):
+    '''
+    Barray, the (N,3,nPoint) ensemble, the levels of detail of Barray (CurvePyramid), the keyframes of the sweep and the segments of a gated wave
+    waves is a waveParameters or a list of them (ensemble, Barray is their superposition)
+    Above store.storeThreshold samples Barray is memory-mapped from disk and the ensemble is not kept
+    fragmented : None or a gate (see gating.py), the samples off are NaN
+    A gated waveParameters is only computed for the visible samples : gating.Segments, Barray is its values (below store.storeThreshold)
+    sweep : (start,end,nKey), the (nKey,3,nPoint) keyframes from the waveParameters start to end replace waves
+    '''
+    if(sweep is not None):
+        keyframes=sweepTrajectory(*sweep,nPoint,fragmented)
+        return keyframes[0],None,None,keyframes,None
+    if(nPoint>store.storeThreshold):
+        #Gated waves too : dense on disk with NaN for the samples off, RAM stays bounded
+        return store.storedTrajectory(waves,nPoint,fragmented,normalize)
+    if(type(waves)==dict and fragmented is not None):
+        segments=gatedTrajectory(waves,nPoint,fragmented)
+        return segments.values,None,None,None,segments
+    if(type(waves)==dict):
+        Barray,Bensemble=trajectory(waves,nPoint,fragmented),None
+        key=waveKey(waves)
+    else:
+        Barray,Bensemble=ensembleTrajectory(waves,nPoint,fragmented,normalize)
+        key=(tuple(waveKey(wave) for wave in waves),normalize)
+    #Gaps of fragmented curves (NaN) are kept, every sample is drawn
+    pyramid=None if fragmented else cached(('lod',key,nPoint),lambda:CurvePyramid(Barray))
+    return Barray,Bensemble,pyramid,None,None
+
+def generateArgs(waveParameters,state,animParameters,ensembleParameters,sweepParameters=None,gateParameters=None):
+    '''Arguments of generate for these parameters (copies, can be sent to another thread or process)'''
+    #When fragmented is enabled
+    fragmented=None
+    if(state['fragmented']):
+        gateParameters=parameters.gateParameters if gateParameters is None else gateParameters
+        fragmented=gating.makeGate(gateParameters['pattern'],animParameters['fragmentedPlotLen'],animParameters['fragmentedNoPlotLen'],gateParameters)
+    waves=dict(waveParameters)
+    if(state['ensemble']):
+        waves=parameters.ensembleWaves(waves,ensembleParameters)
+    sweep=None
+    if(state.get('sweep') and sweepParameters is not None):
+        nKey=max(2,min(sweepParameters['keyframes'],sweepBudget//(3*animParameters['nPoint'])))
+        sweep=(*parameters.sweepEnds(waveParameters,sweepParameters),nKey)
+    return waves,animParameters['nPoint'],fragmented,ensembleParameters['normalize'],sweep
+
+def frameCount(state,animParameters,sweepParameters,fps):
+    '''Frames of one loop of the animation : nPoint, or the whole sweep at fps'''
+    if(state.get('sweep')):
+        return max(2,round(sweepParameters['duration']*fps))*(2 if sweepParameters['pingpong'] else 1)
+    return animParameters['nPoint']
+
+def sweepPosition(frame,nFrame,pingpong):
+    '''Position (0 to 1) in the sweep at frame, nFrame frames per loop'''
+    frame%=nFrame
+    if(pingpong):
+        return 1-abs(2*frame/nFrame-1)
+    return frame/(nFrame-1)
+
+def isConstant(curve):
+    '''True if every sample of the (3,n) curve is the same, NaN (samples off) ignored'''
+    curve=curve[:,~np.isnan(curve).any(axis=0)]
+    return curve.shape[1]==0 or not(np.ptp(curve,axis=1).any())
+
+class WaveScene:
+    """
+    Plots of the wave on a 3D axes of fig
+    waveParameters, state, animParameters and ensembleParameters are the dictionaries of parameters.py (GUI) or copies of them
+    Plain dictionaries are copied into parameters.Parameters, their versions tell what changed since the last frame
+    """
+    def initScene(self,fig,waveParameters,state,animParameters,ensembleParameters=None,streamParameters=None,session=None,sweepParameters=None,gateParameters=None,viewParameters=None):
+        '''
+        session : path of a trajectory saved by store.writeTrajectory, shown instead of the generated one
+        viewParameters : 2D views shown next to the 3D axes, see layoutViews
+        fps (attribute) : frames per second of the animation, sets the number of frames of a sweep
+        '''
+        self.fig=fig
+        self.waveParameters=parameters.observable(waveParameters)
+        self.state=parameters.observable(state)
+        self.animParameters=parameters.observable(animParameters)
+        self.ensembleParameters=parameters.observable(dict(parameters.ensembleParameters) if ensembleParameters is None else ensembleParameters)
+        self.streamParameters=parameters.observable(dict(parameters.streamParameters) if streamParameters is None else streamParameters)
+        self.sweepParameters=parameters.observable(dict(parameters.sweepParameters) if sweepParameters is None else sweepParameters)
+        self.gateParameters=parameters.observable(dict(parameters.gateParameters) if gateParameters is None else gateParameters)
+        self.viewParameters=parameters.observable(dict.fromkeys(viewNames,False) if viewParameters is None else viewParameters)
+        self.fps=animParameters['fps']
+        self.stream=None #Stream of samples displayed instead of the trajectory, see startStream
+        self.session=session
+        self.lod=0 #Level of detail of the curves, see updateLod
+        self.staticArray=None #(Barray,lod) of the static curve
+        self.backgroundChanged=False #Set when something drawn in the background changes, see refreshStatic
+        self.profiler=Profiler(animParameters['interval'])
+        self.ax = fig.subplots(subplot_kw={'projection': '3d'})
+        self.ax.grid(False)
+        self.ensembleFig=EnsembleCurves(self.ax)
+        self.gatedFig=GatedCurve(self.ax,color='blue')
+        self.setTrajectory(self.Bgen())
+        self.vectorTrackFig=VectorTrail(self.ax,animParameters['nVector'])
+        self.figDic={'track':self.ax.plot([],[],[],color='green'),'static':self.ax.plot([],[],[],color='blue')}
+        self.limKey=None #(trajectory,version of waveParameters) of the last autoscale
+        self.views=[] #Views enabled, in the order of viewNames
+        self.viewCache={} #Every view created, hidden when it is disabled
+        self.viewArray=None #(Barray,lod) of the curves of the views
+        self.layoutViews()
+
+    def drawFrame(self,frame,time=None):
+        """
+        frame : iterator object
+        time : index of the current point in Barray, frame by default
+        Select in function of the state the plot wanted
+        """
+        if(time is None):
+            time=frame%(self.Barray.shape[1] if self.segments is None else self.segments.nPoint)
+        self.profiler.frame()
+        if(self.keyframes is not None and self.stream is None):
+            self.plotSweep(frame)
+        #Static plot and scale are part of the background, see refreshStatic
+        #3 plots avaible monitored by a checkbox:
+        if(self.state['vectorTrack']):
+            #Length of the ring buffer : a new nVector is only applied by resizeVect, after the frames already scheduled
+            self.plotVectorTrack(self.vectorTrackFig.nVector,time,frame)
+        if(self.state['vector'] and not(self.state['vectorTrack'])):
+            self.plotVectorTrack(1,time,frame)
+            #Vector : plot a vector between (0,0) and the point (x,y,z) at t
+        if(self.state['timeTrack']):
+            self.plotTimeTrack(time)
+            #Track : plot frame by frame the signal
+        if(self.state['ensemble'] and self.stream is None):
+            self.ensembleFig.plotTime(frame)
+        if(self.views):
+            self.plotViewsTime(time)
+        #Only the moving artists are redrawn when blit is enabled
+        return self.movingArtists()
+
+    def movingArtists(self):
+        #The static curve morphs during a sweep, the curves of the views during a sweep and a stream
+        morphing=[]
+        if(self.keyframes is not None and self.state['static']):
+            morphing.append(self.figDic['static'][0])
+        if(self.keyframes is not None or self.stream is not None):
+            morphing+=[artist for view in self.views for artist in view.curveArtists()]
+        cursors=[artist for view in self.views for artist in view.artists()]
+        return [self.figDic['track'][0]]+self.vectorTrackFig.artists()+self.ensembleFig.artists()+cursors+morphing
+
+    def morphingArtists(self):
+        '''Artists of the background moving during a sweep or a stream, see movingArtists'''
+        return [self.figDic['static'][0]]+[artist for view in self.viewCache.values() for artist in view.curveArtists()]
+
+    def layoutViews(self):
+        '''
+        3D axes on the left, one row on the right for each view enabled in viewParameters
+        Every view shows the arrays of the scene and is drawn by the same animation
+        '''
+        names=[name for name in viewNames if self.viewParameters.get(name)]
+        #Axes are hidden rather than removed : the animation keeps the artists it has drawn
+        for name,view in self.viewCache.items():
+            view.ax.set_visible(name in names)
+        if(names==[]):
+            self.views=[]
+            self.ax.set_subplotspec(self.fig.add_gridspec(1,1)[0])
+            return
+        grid=self.fig.add_gridspec(len(names),3,wspace=0.4,hspace=0.5)
+        self.ax.set_subplotspec(grid[:,:2])
+        for i,name in enumerate(names):
+            if(name in self.viewCache):
+                self.viewCache[name].ax.set_subplotspec(grid[i,2])
+            else:
+                self.viewCache[name]=makeView(self.fig.add_subplot(grid[i,2]),name)
+        self.views=[self.viewCache[name] for name in names]
+        self.viewArray=None
+        self.plotViews()
+        self.setViewLimits()
+
+    def timeLength(self):
+        '''Samples along the time axis of the views'''
+        if(self.stream is not None):
+            return self.streamParameters['capacity']
+        return self.Barray.shape[1] if self.segments is None else self.segments.nPoint
+
+    def setViewLimits(self):
+        '''Views on the same scale as the 3D axes'''
+        lims=(self.ax.get_xlim3d(),self.ax.get_ylim3d(),self.ax.get_zlim3d())
+        for view in self.views:
+            view.setLimits(lims,self.timeLength())
+
+    def curveData(self):
+        '''Times and samples of the curve drawn at the current level of detail'''
+        if(self.segments is not None):
+            return self.segments.times(),self.segments.values
+        if(self.pyramid is not None):
+            return self.pyramid.indices[self.lod],self.pyramid.levels[self.lod]
+        return np.arange(self.Barray.shape[1]),self.Barray
+
+    def plotViews(self):
+        '''Curves of the views, only set when the trajectory or the level of detail changes'''
+        if(self.viewArray is not None and self.viewArray[0] is self.Barray and self.viewArray[1]==self.lod):
+            return
+        self.viewArray=(self.Barray,self.lod)
+        self.backgroundChanged=True
+        t,curve=self.curveData()
+        for view in self.views:
+            view.setCurve(t,curve)
+
+    def plotViewsTime(self,time):
+        with self.profiler.stage('plotViews'):
+            if(self.keyframes is not None or self.stream is not None):
+                #Barray changed in place or replaced at each frame
+                t=np.arange(self.Barray.shape[1])
+                for view in self.views:
+                    view.setCurve(t,self.Barray)
+            point=self.pointAt(time)
+            for view in self.views:
+                view.plotTime(time,point)
+
+    def pointAt(self,time):
+        '''Sample at time, None when it is not visible (gated wave)'''
+        if(self.segments is None):
+            return self.Barray[:,time]
+        return self.segments.at(time)
+
+    def frameCount(self):
+        return frameCount(self.state,self.animParameters,self.sweepParameters,self.fps)
+
+    def isStill(self):
+        '''True when the next frames are all the same : nothing moving is shown or the trajectory is constant'''
+        if(self.stream is not None or self.keyframes is not None or self.state['profiler']):
+            return False
+        moving=self.state['vector'] or self.state['vectorTrack'] or self.state['timeTrack'] or self.state['ensemble']
+        return not(moving) or self.constant
+
+    def setLimits(self):
+        '''Maximum of amplitude of one axe set the scale for the other, only recomputed when the trajectory or waveParameters changes'''
+        waveParameters=self.waveParameters
+        if(not(self.state['autoscale'])):
+            self.limKey=None
+            return
+        if(self.limKey is not None and self.limKey[0] is self.trajectoryResult and self.limKey[1]==waveParameters.version):
+            return
+        self.limKey=(self.trajectoryResult,waveParameters.version)
+        self.backgroundChanged=True
+        if(self.keyframes is not None):
+            lim=np.nanmax(np.abs(self.keyframes))
+        elif(self.state['ensemble']):
+            #Superposition : scale given by the curves themselves (overview of the curve when it is on disk), NaN when fragmented
+            lim=np.nanmax(np.abs(self.Barray if self.pyramid is None else self.pyramid.levels[0]))
+            if(self.Bensemble is not None):
+                lim=max(lim,np.nanmax(np.abs(self.Bensemble)))
+        else:
+            lim=max(waveParameters['amplitude x']+waveParameters['offset x'],waveParameters['amplitude y']+waveParameters['offset y'],waveParameters['amplitude z']+waveParameters['offset z'])
+        self.ax.set_xlim3d(-lim,lim)
+        self.ax.set_ylim3d(-lim,lim)
+        self.ax.set_zlim3d(-lim,lim)
+        self.setViewLimits()
+
+    def refreshStatic(self):
+        '''Update what does not move during the animation (static plot, scale), True if the background has to be drawn again'''
+        with self.profiler.stage('refreshStatic'):
+            self.backgroundChanged=False
+            if(self.stream is not None):
+                #Streaming : nothing is static, the scale only grows with the samples (see streamFrame)
+                self.initCoord(self.figDic['static'][0])
+                self.gatedFig.setSegments(None)
+                self.staticArray=None
+                self.ensembleFig.setEnsemble(None)
+                return True
+            self.setLimits()
+            if(not(self.state['static']) and self.staticArray is not None):
+                self.initCoord(self.figDic['static'][0])
+                self.gatedFig.setSegments(None)
+                self.staticArray=None
+                self.backgroundChanged=True
+            self.updateLod()
+            if(self.ensembleFig.ensemble is not self.Bensemble):
+                self.ensembleFig.setEnsemble(self.Bensemble)
+                self.backgroundChanged=True
+            return self.backgroundChanged
+
+    def lodLevel(self):
+        '''Level of detail whose error is under half a pixel for the size of the axes and the limits (zoom)'''
+        if(self.pyramid is None):
+            return 0
+        span=max(np.ptp(self.ax.get_xlim3d()),np.ptp(self.ax.get_ylim3d()),np.ptp(self.ax.get_zlim3d()))
+        pixel=span/max(1,min(self.ax.bbox.width,self.ax.bbox.height))
+        return self.pyramid.level(pixel/2)
+
+    def updateLod(self):
+        '''Pick the level of detail again (new trajectory, canvas resized, zoom), the static curve is only set when it changes'''
+        self.lod=self.lodLevel()
+        if(self.state['static'] and self.stream is None):
+            self.plotStatic()
+            #Stationary : plot the entire  signal
+        if(self.stream is None and self.keyframes is None):
+            self.plotViews()
+
+    def BgenArgs(self):
+        '''Arguments of generate for the current parameters (copies, can be sent to another thread)'''
+        return generateArgs(self.waveParameters,self.state,self.animParameters,self.ensembleParameters,self.sweepParameters,self.gateParameters)
+
+    def Bgen(self):
+        """
+        Generate new arrays thanks to the trajectory engine (cached, read-only), see generate
+        A session is read from disk instead
+        """
+        with self.profiler.stage('Bgen'):
+            if(self.session is not None):
+                return store.loadTrajectory(self.session)[0]
+            return generate(*self.BgenArgs())
+
+    def saveSession(self,path):
+        '''Write the trajectory of the current parameters and these parameters in path (.npy), see store.writeTrajectory'''
+        session={'waveParameters':self.waveParameters,'state':self.state,'animParameters':self.animParameters,'ensembleParameters':self.ensembleParameters,'gateParameters':self.gateParameters}
+        #A sweep is saved as its current parameters
+        store.writeTrajectory(path,*self.BgenArgs()[:4],session=session)
+
+    def setTrajectory(self,result):
+        self.trajectoryResult=result
+        #While streaming Barray is the window of samples, the trajectory is restored by stopStream
+        if(self.stream is None):
+            self.Barray,self.Bensemble,self.pyramid,self.keyframes,self.segments=result
+            if(self.keyframes is not None):
+                #Curve of the current position in the sweep, see plotSweep
+                self.Barray=np.array(self.keyframes[0])
+            #Constant field (e.g. permanent magnet) : the vectors do not move, see isStill
+            curve=self.Barray if self.pyramid is None else self.pyramid.levels[-1]
+            curve=curve[:,::max(1,curve.shape[1]//store.overviewLen)]
+            self.constant=isConstant(curve) and (self.Bensemble is None or isConstant(self.Bensemble.transpose(1,0,2).reshape(3,-1)))
+
+    def startStream(self,source):
+        '''Display the samples of source (sources.DataSource) instead of the trajectory'''
+        from sources import Stream
+        self.stopStream()
+        self.stream=Stream(source,self.streamParameters['capacity'],self.streamParameters['displayRate'])
+        self.streamLim=0
+        self.Barray=np.zeros((3,0))
+        self.Bensemble=None
+        self.pyramid=None
+        self.keyframes=None
+        self.segments=None
+
+    def stopStream(self):
+        if(self.stream is None):
+            return
+        self.stream.close()
+        self.stream=None
+        self.limKey=None
+        self.viewArray=None
+        self.setTrajectory(self.trajectoryResult)
+
+    def streamFrame(self,frame):
+        """
+        Frame of the streaming mode : Barray is the window of the last samples, the vector is the last one
+        limitsChanged is set when the scale grows, the background has to be redrawn
+        """
+        with self.profiler.stage('stream'):
+            self.stream.poll()
+            self.Barray=self.stream.window()
+        self.limitsChanged=False
+        if(self.Barray.shape[1]==0):
+            self.profiler.frame()
+            return self.movingArtists()
+        if(self.state['autoscale']):
+            lim=np.abs(self.Barray).max()
+            if(lim>self.streamLim):
+                #Margin so that the background is not redrawn at each new maximum
+                self.streamLim=1.25*lim
+                self.ax.set_xlim3d(-self.streamLim,self.streamLim)
+                self.ax.set_ylim3d(-self.streamLim,self.streamLim)
+                self.ax.set_zlim3d(-self.streamLim,self.streamLim)
+                self.setViewLimits()
+                self.limitsChanged=True
+        return self.drawFrame(frame,self.Barray.shape[1]-1)
+
+    def plotSweep(self,frame):
+        '''Morph of the sweep : Barray becomes the curve interpolated between the keyframes at frame'''
+        with self.profiler.stage('plotSweep'):
+            position=sweepPosition(frame,self.frameCount(),self.sweepParameters['pingpong'])
+            blendKeyframes(self.keyframes,position,out=self.Barray)
+            if(self.state['static']):
+                self.figDic['static'][0].set_data_3d(self.Barray)
+
+    def plotVectorTrack(self,nVect,time,frame=None):
+        '''
+        Plot nVect vector
+        attenuation decreasing in 1/nVect, last vector ploted has a attenuation of 1 then decreasing
+        frame : position in the ring buffer when it is not time (streaming)
+        '''
+        ind=(time if frame is None else frame)%nVect #time modulo number of vector(ie. time module number of vector in the ring buffer)
+        with self.profiler.stage('plotVectorTrack'):
+            point=self.pointAt(time)
+            #Sample off : NaN, the vector is hidden
+            self.vectorTrackFig.write(ind,np.nan if point is None else point)#Set new vector at the index ind with the current time
+            with self.profiler.stage('opacity'):
+                self.vectorTrackFig.opacity(nVect,ind)#opacity shifted
+
+    def plotStatic(self):
+        if(self.staticArray is not None and self.staticArray[0] is self.Barray and self.staticArray[1]==self.lod):
+            return
+        self.staticArray=(self.Barray,self.lod)
+        self.backgroundChanged=True
+        #Segments of a gated wave : one collection instead of the line
+        self.gatedFig.setSegments(self.segments)
+        if(self.segments is not None):
+            self.initCoord(self.figDic['static'][0])
+        elif(self.pyramid is None):
+            self.figDic['static'][0].set_data_3d(self.Barray)
+        else:
+            self.figDic['static'][0].set_data_3d(self.pyramid.levels[self.lod])
+
+    def plotTimeTrack(self,time):
+        with self.profiler.stage('plotTimeTrack'):
+            if(self.segments is not None):
+                self.figDic['track'][0].set_data_3d(self.segments.prefix(time))
+            elif(self.pyramid is None):
+                self.figDic['track'][0].set_data_3d(self.Barray[0][:time],self.Barray[1][:time],self.Barray[2][:time])
+            else:
+                self.figDic['track'][0].set_data_3d(self.pyramid.prefix(self.lod,time))
+
+    def initVect(self):
+        self.vectorTrackFig.clear()
+
+    def initCoord(self,name):
+    #Reset values for each axis
+        name.set_data_3d([],[],[])
+
+    def resizeVect(self):
+        #New ring buffer, previous vectors are deleted
+        self.vectorTrackFig.resize(self.animParameters['nVector'])
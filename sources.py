@@ -0,0 +1,353 @@
+"""
+Data sources for the streaming mode : samples (3,k) of the field read without blocking the animation
+Every buffer is bounded, memory stays constant however long the stream runs
+
+Test feeder, sends a synthetic wave to the socket source of the GUI :
+    python sources.py --port 5005 --rate 2000
+"""
+import argparse
+import math
+import os
+import socket
+import stat
+import threading
+import time
+import numpy as np
+from trajectory import B,axisParameters
+
+class RingBuffer:
+    """
+    Last capacity samples (x,y,z) written, total count of samples written in written
+    """
+    def __init__(self,capacity):
+        self.capacity=capacity
+        self.data=np.zeros((3,capacity))
+        self.written=0
+        self.lock=threading.Lock()
+
+    def write(self,samples):
+        k=samples.shape[1]
+        with self.lock:
+            if(k>self.capacity):
+                self.written+=k-self.capacity
+                samples=samples[:,-self.capacity:]
+                k=self.capacity
+            start=self.written%self.capacity
+            first=min(k,self.capacity-start)
+            self.data[:,start:start+first]=samples[:,:first]
+            self.data[:,:k-first]=samples[:,first:]
+            self.written+=k
+
+    def window(self,n=None):
+        '''Copy of the last n samples (all by default) in order'''
+        with self.lock:
+            return self.last(self.written if n is None else n)
+
+    def since(self,count):
+        '''Samples written after the first count ones (only the last capacity) and the new count'''
+        #Same lock for both : a write in between would skip samples then return them again
+        with self.lock:
+            return self.last(self.written-count),self.written
+
+    def last(self,n):
+        '''Copy of the last n samples in order, the lock is held by the caller'''
+        n=min(n,self.capacity,self.written)
+        return self.data.take(range(self.written-n,self.written),axis=1,mode='wrap')
+
+class DataSource:
+    """
+    read() returns the samples (3,k) received since the last call, never blocks
+    """
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SyntheticSource(DataSource):
+    """
+    B() of the trajectory engine sampled in real time, rate samples per second, nPoint samples for t from 0 to 1
+    """
+    def __init__(self,waveParameters,nPoint,rate,maxBurst=100000):
+        self.columns=axisParameters(waveParameters)
+        self.nPoint=nPoint
+        self.rate=rate
+        self.maxBurst=maxBurst #Samples skipped instead of generated after a long pause
+        self.start=time.perf_counter()
+        self.produced=0
+
+    def read(self):
+        due=int((time.perf_counter()-self.start)*self.rate)
+        if(due-self.produced>self.maxBurst):
+            self.produced=due-self.maxBurst
+        t=np.arange(self.produced,due,dtype=float)
+        self.produced=due
+        freq,amplitude,phi,offset=self.columns
+        return B(freq,amplitude,phi,t,self.nPoint,offset=offset)
+
+class FileSource(DataSource):
+    """
+    Replay of a file at rate samples per second, .npy (3,N) or (N,3) memory-mapped, or text with x y z on each line
+    """
+    def __init__(self,path,rate,loop=True,maxBurst=100000):
+        self.path=path
+        self.rate=rate
+        self.loop=loop
+        self.maxBurst=maxBurst
+        self.array=None
+        self.file=None
+        if(path.endswith('.npy')):
+            array=np.load(path,mmap_mode='r')
+            self.array=array if array.shape[0]==3 else array.T
+            self.position=0
+        else:
+            self.file=open(path)
+        self.start=time.perf_counter()
+        self.produced=0
+
+    def read(self):
+        due=int((time.perf_counter()-self.start)*self.rate)
+        n=min(due-self.produced,self.maxBurst)
+        self.produced=due
+        if(self.array is not None):
+            return self.readArray(n)
+        return self.readText(n)
+
+    def readArray(self,n):
+        chunks=[]
+        while(n>0):
+            chunk=self.array[:,self.position:self.position+n]
+            if(chunk.shape[1]==0):
+                if(not(self.loop) or self.position==0):
+                    break
+                self.position=0
+                continue
+            chunks.append(np.asarray(chunk,dtype=float))
+            self.position+=chunk.shape[1]
+            n-=chunk.shape[1]
+        return np.concatenate(chunks,axis=1) if chunks else np.empty((3,0))
+
+    def readText(self,n):
+        samples=[]
+        while(len(samples)<n):
+            line=self.file.readline()
+            if(line==''):
+                if(not(self.loop) or self.file.tell()==0):
+                    break
+                self.file.seek(0)
+                continue
+            values=parseLine(line)
+            if(values is not None):
+                samples.append(values)
+        return np.array(samples,dtype=float).reshape(-1,3).T
+
+    def close(self):
+        if(self.file is not None):
+            self.file.close()
+
+def parseLine(line):
+    '''x y z (separated by spaces, commas or semicolons), None for headers and wrong lines'''
+    try:
+        values=[float(v) for v in line.replace(',',' ').replace(';',' ').split()]
+    except ValueError:
+        return None
+    return values if len(values)==3 else None
+
+class StreamSource(DataSource):
+    """
+    Lines x y z read from a text stream by a background thread, only the last capacity samples not read are kept
+    open : function returning the stream (called in the thread, can block), None at the end
+    """
+    def __init__(self,open,capacity=100000):
+        self.pending=RingBuffer(capacity)
+        self.count=0
+        self.stream=None
+        self.closed=False
+        self.thread=threading.Thread(target=self.run,args=(open,),daemon=True)
+        self.thread.start()
+
+    def run(self,open):
+        while(not(self.closed)):
+            self.stream=open()
+            if(self.stream is None):
+                return
+            samples=[]
+            last=time.perf_counter()
+            for line in self.stream:
+                values=parseLine(line)
+                if(values is not None):
+                    samples.append(values)
+                #Samples are written by blocks, at least every 10 ms
+                if(len(samples)>=1000 or time.perf_counter()-last>0.01):
+                    self.pending.write(np.array(samples,dtype=float).reshape(-1,3).T)
+                    samples=[]
+                    last=time.perf_counter()
+                if(self.closed):
+                    return
+            self.pending.write(np.array(samples,dtype=float).reshape(-1,3).T)
+
+    def read(self):
+        samples,self.count=self.pending.since(self.count)
+        return samples
+
+    def close(self):
+        self.closed=True
+        if(self.stream is not None):
+            self.stream.close()
+
+class SocketSource(StreamSource):
+    """
+    Listen on a local TCP port, a feeder connects and sends lines x y z, a new feeder can connect after the previous one
+    """
+    def __init__(self,port,host='127.0.0.1',capacity=100000):
+        self.server=socket.create_server((host,port))
+        #accept is not woken by close on every platform, it checks closed regularly
+        self.server.settimeout(0.2)
+        self.connection=None
+        super().__init__(self.accept,capacity)
+
+    def accept(self):
+        while(not(self.closed)):
+            try:
+                self.connection,address=self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return None #Closed
+            self.connection.settimeout(None)
+            return self.connection.makefile('r')
+        return None
+
+    def close(self):
+        super().close()
+        try:
+            #Wakes the accept of the thread now, the port is free as soon as close returns
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass #Not supported for a listening socket on this platform, see the timeout of accept
+        self.server.close()
+        if(self.connection is not None):
+            self.connection.close()
+
+class FileTail:
+    """
+    Lines of a regular file, the end of the file is followed as it grows (tail -f) until close
+    """
+    def __init__(self,path):
+        self.file=open(path)
+        self.closed=False
+
+    def __iter__(self):
+        partial=''
+        while(not(self.closed)):
+            try:
+                line=self.file.readline()
+            except ValueError:
+                return #Closed by another thread
+            if(line==''):
+                #Empty line while waiting : the reader writes the samples received so far
+                time.sleep(0.01)
+                yield ''
+                continue
+            #A line is complete once its end of line is written
+            partial+=line
+            if(partial.endswith('\n')):
+                yield partial
+                partial=''
+
+    def close(self):
+        self.closed=True
+        self.file.close()
+
+class PipeSource(StreamSource):
+    """
+    Lines x y z read from a named pipe, reopened when the writer closes it,
+    or from a regular file read from its start then followed as it grows (FileTail)
+    """
+    def __init__(self,path,capacity=100000):
+        fifo=stat.S_ISFIFO(os.stat(path).st_mode)
+        super().__init__(lambda:open(path) if fifo else FileTail(path),capacity)
+
+    def close(self):
+        #Opening a FIFO blocks until a writer opens it, the thread is a daemon
+        self.closed=True
+        if(self.stream is not None):
+            self.stream.close()
+
+class Stream:
+    """
+    Display buffer of the last capacity samples of source
+    Input faster than displayRate samples per second is decimated (one sample kept every decimation)
+    """
+    def __init__(self,source,capacity,displayRate):
+        self.source=source
+        self.buffer=RingBuffer(capacity)
+        self.displayRate=displayRate
+        self.decimation=1
+        self.inputRate=0
+        self.received=0
+        self.lastPoll=None
+
+    def poll(self):
+        samples=self.source.read()
+        k=samples.shape[1]
+        now=time.perf_counter()
+        if(self.lastPoll is not None and now>self.lastPoll):
+            #Smoothed estimation of the input rate
+            self.inputRate=0.9*self.inputRate+0.1*k/(now-self.lastPoll)
+            self.decimation=max(1,math.ceil(self.inputRate/self.displayRate))
+        self.lastPoll=now
+        #Keep the samples whose global index is a multiple of decimation
+        kept=samples[:,(-self.received)%self.decimation::self.decimation]
+        self.received+=k
+        self.buffer.write(kept)
+
+    def window(self):
+        return self.buffer.window()
+
+    def close(self):
+        self.source.close()
+
+def openSource(streamParameters,waveParameters,nPoint):
+    """
+    Data source described by streamParameters : source in 'synthetic', 'file', 'socket', 'pipe'
+    """
+    source=streamParameters['source']
+    if(source=='synthetic'):
+        return SyntheticSource(waveParameters,nPoint,streamParameters['rate'])
+    if(source=='file'):
+        return FileSource(streamParameters['path'],streamParameters['rate'])
+    if(source=='socket'):
+        return SocketSource(streamParameters['port'])
+    if(source=='pipe'):
+        return PipeSource(streamParameters['path'])
+    raise ValueError('unknown source '+source)
+
+def feed(port,rate,waveParameters,nPoint,host='127.0.0.1'):
+    '''Send a synthetic wave to a socket source until interrupted'''
+    source=SyntheticSource(waveParameters,nPoint,rate)
+    with socket.create_connection((host,port)) as connection:
+        while(True):
+            samples=source.read()
+            if(samples.shape[1]):
+                try:
+                    connection.sendall(''.join('%g %g %g\n'%tuple(sample) for sample in samples.T).encode())
+                except (BrokenPipeError,ConnectionResetError):
+                    return #Source closed
+            time.sleep(0.005)
+
+def main(argv=None):
+    from parameters import waveParameters,presetWave,animParameters
+    parser=argparse.ArgumentParser(description='Test feeder : send a synthetic wave to the socket source')
+    parser.add_argument('--port',type=int,default=5005)
+    parser.add_argument('--rate',type=float,default=2000,help='samples per second')
+    parser.add_argument('--preset',default=None)
+    args=parser.parse_args(argv)
+    wave=presetWave(args.preset) if args.preset else waveParameters
+    try:
+        feed(args.port,args.rate,wave,animParameters['nPoint'])
+    except KeyboardInterrupt:
+        pass
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup time of the GUI : a new process is launched for each run and reports when
+the script is imported, when the window is shown and when the canvas draws its first frame
+Results are written and compared as the ones of benchmark.py
+
+usage : python startup.py -o startup.json
+        python startup.py -o startup.json --compare old.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmark import addReportArguments,report
+
+script=os.path.join(os.path.dirname(os.path.abspath(__file__)),'visualisation 3D electromagnetic wave 1.0.py')
+
+#Run in the child process, prints one JSON line of wall clock times
+child='''
+import json,runpy,sys,time
+sys.path.insert(0,%r)
+marks={}
+main=runpy.run_path(%r,run_name='startup')
+marks['import']=time.time()
+from PyQt5 import QtWidgets,QtCore
+app=QtWidgets.QApplication(sys.argv)
+w=main['MainWindow']()
+def shown():
+    marks['window']=time.time()
+def ready():
+    marks['canvas']=time.time()
+    def drawn(event):
+        marks['first draw']=time.time()
+        print(json.dumps(marks))
+        app.quit()
+    w.visu.mpl_connect('draw_event',drawn)
+QtCore.QTimer.singleShot(0,shown)
+w.canvasReady.connect(ready)
+QtCore.QTimer.singleShot(60000,app.quit)
+app.exec_()
+'''%(os.path.dirname(script),script)
+
+def measure(offscreen):
+    '''Seconds from the launch of the process to each step of the startup'''
+    env=dict(os.environ)
+    if(offscreen):
+        env['QT_QPA_PLATFORM']='offscreen'
+    start=time.time()
+    output=subprocess.run([sys.executable,'-c',child],env=env,capture_output=True,text=True,check=True).stdout
+    marks=json.loads(output.strip().splitlines()[-1])
+    return {name:t-start for name,t in marks.items()}
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Startup time of the 3D wave visualisation')
+    addReportArguments(parser,'startup.json')
+    parser.add_argument('--repeat',type=int,default=5,help='number of launches, the median is kept')
+    parser.add_argument('--offscreen',action='store_true',help='no display needed (Qt offscreen platform)')
+    args=parser.parse_args(argv)
+
+    runs=[measure(args.offscreen) for i in range(args.repeat)]
+    results=[]
+    for name in ('import','window','canvas','first draw'):
+        results.append({'name':'startup '+name,'time (s)':float(np.median([run[name] for run in runs]))})
+        print('%-20s %8.3f s'%(results[-1]['name'],results[-1]['time (s)']))
+    report(results,args.output,args.compare,args.threshold)
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+On-disk trajectory store : float32 .npy file (nPoint,3) written chunk by chunk and memory-mapped when read
+The session (parameters of the trajectory) is saved in a .json file next to it
+
+Trajectories longer than storeThreshold samples are generated in storeFolder instead of RAM,
+a saved session is reopened without generating anything
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+import numpy as np
+from trajectory import axisParameters,ensembleColumns,computeWaves,cached
+from lod import CurvePyramid,GatedOverview
+from gating import maskSegments,mergeSegments
+
+storeThreshold=2**22 #Samples, longer trajectories are generated on disk
+storeFolder=os.path.join(tempfile.gettempdir(),'wave3d-trajectories')
+storeCacheSize=4 #Number of generated trajectories kept in storeFolder
+chunkLen=2**20 #Samples computed at once when writing
+overviewLen=2**18 #Samples used for the levels of detail of a stored trajectory
+
+def sessionPath(path):
+    return os.path.splitext(path)[0]+'.json'
+
+def writeTrajectory(path,waves,nPoint,fragmented,normalize=True,session=None):
+    """
+    Generate the trajectory into path chunk by chunk, only one chunk is held in RAM
+    waves, nPoint, fragmented, normalize : see scene.generate, an ensemble only stores its superposition
+    session : dictionary saved with the trajectory
+    """
+    if(type(waves)==dict):
+        columns,nWave=axisParameters(waves),1
+    else:
+        columns,nWave=ensembleColumns(waves),len(waves)
+    #Written next to path then renamed, a store found on disk is always complete
+    tmp='%s.%d.tmp'%(path,os.getpid())
+    array=np.lib.format.open_memmap(tmp,mode='w+',dtype=np.float32,shape=(nPoint,3))
+    length=max(1024,chunkLen//nWave)
+    for start in range(0,nPoint,length):
+        coord=computeWaves(*columns,nPoint,fragmented,start,min(length,nPoint-start))
+        if(nWave>1):
+            coord=coord.reshape(nWave,3,-1).sum(axis=0)
+            if(normalize):
+                coord/=nWave
+        array[start:start+coord.shape[1]]=coord.T
+    array.flush()
+    del array
+    os.replace(tmp,path)
+    session=dict(session or {},waves=waves,nPoint=nPoint,fragmented=fragmented,normalize=normalize)
+    with open(sessionPath(path),'w') as f:
+        json.dump(session,f,indent=1)
+
+def openTrajectory(path):
+    """
+    Read-only (3,nPoint) memory-mapped view of the trajectory stored in path and its session
+    """
+    Barray=np.load(path,mmap_mode='r').T
+    with open(sessionPath(path)) as f:
+        session=json.load(f)
+    if(session['fragmented'] is not None):
+        session['fragmented']=tuple(session['fragmented'])
+    return Barray,session
+
+def loadTrajectory(path):
+    """
+    Result of scene.generate for the trajectory stored in path (no ensemble, levels of detail from an overview) and its session
+    A fragmented trajectory is stored with NaN for the samples off, its overview keeps the gaps (lod.GatedOverview)
+    """
+    Barray,session=openTrajectory(path)
+    key=('lod',os.path.abspath(path),os.path.getmtime(path))
+    if(session['fragmented'] is None):
+        step=max(1,math.ceil(Barray.shape[1]/overviewLen))
+        pyramid=cached(key,lambda:CurvePyramid(Barray,step=step))
+    else:
+        pyramid=cached(key,lambda:GatedOverview(Barray,*visibleSegments(Barray),overviewLen))
+    return (Barray,None,pyramid,None,None),session
+
+def visibleSegments(Barray):
+    '''(starts,stops) of the runs of samples which are not NaN (samples on) of a stored trajectory, read chunk by chunk'''
+    starts,stops=[],[]
+    for start in range(0,Barray.shape[1],chunkLen):
+        on=~np.isnan(Barray[0,start:start+chunkLen])
+        chunkStarts,chunkStops=maskSegments(on)
+        starts.append(chunkStarts+start)
+        stops.append(chunkStops+start)
+    #Runs cut by the end of a chunk are joined
+    return mergeSegments(np.concatenate(starts or [np.zeros(0,dtype=int)]),np.concatenate(stops or [np.zeros(0,dtype=int)]))
+
+def storedTrajectory(waves,nPoint,fragmented,normalize=True):
+    """
+    Result of scene.generate for a trajectory too long for RAM, generated once in storeFolder
+    """
+    key=json.dumps([waves,nPoint,fragmented,normalize],sort_keys=True)
+    path=os.path.join(storeFolder,hashlib.sha1(key.encode()).hexdigest()+'.npy')
+    if(not(os.path.exists(path))):
+        os.makedirs(storeFolder,exist_ok=True)
+        writeTrajectory(path,waves,nPoint,fragmented,normalize)
+        pruneStores()
+    else:
+        os.utime(path,(time.time(),os.path.getmtime(path))) #Access time : most recently used, see pruneStores
+    return loadTrajectory(path)[0]
+
+def pruneStores():
+    '''Delete the least recently used trajectories of storeFolder beyond storeCacheSize'''
+    paths=sorted((os.path.join(storeFolder,name) for name in os.listdir(storeFolder) if name.endswith('.npy')),key=os.path.getatime)
+    for path in paths[:-storeCacheSize]:
+        for name in (path,sessionPath(path)):
+            try:
+                os.remove(name)
+            except OSError:
+                pass #Still mapped (Windows) or removed by another process
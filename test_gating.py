@@ -0,0 +1,134 @@
+"""
+Brute-force checks of gating.py : segments of each gate against the boolean mask built sample by sample
+"""
+import numpy as np
+import os
+import pytest
+from gating import gateSegments,gateMask,Segments,makeGate
+
+gates=[('periodic',10,5),('periodic',1,1),('periodic',1,3),('periodic',4,0),('pulses',3,2,4,10),('pulses',2,0,3,0),('pulses',1,1,2,5),('random',0.4,7,1),('random',0.5,1,3),(10,5)]
+lengths=[0,1,7,100,1001]
+
+def bruteMask(gate,nPoint):
+    '''Visible samples of the gate computed one sample at a time'''
+    if(type(gate[0])!=str):
+        gate=('periodic',*gate)
+    t=np.arange(nPoint)
+    if(gate[0]=='periodic'):
+        return t%(gate[1]+gate[2])<gate[1]
+    if(gate[0]=='pulses'):
+        width,gap,count,pause=gate[1:]
+        inBurst=t%(count*(width+gap)+pause)
+        return (inBurst<count*(width+gap))&(inBurst%(width+gap)<width)
+    keep,runLen,seed=gate[1:]
+    kept=np.random.default_rng(seed).random(-(-nPoint//runLen))<keep
+    return kept[t//runLen]
+
+def test_segments():
+    for gate in gates:
+        for nPoint in lengths:
+            starts,stops=gateSegments(gate,nPoint)
+            mask=np.zeros(nPoint,dtype=bool)
+            for start,stop in zip(starts,stops):
+                mask[start:stop]=True
+            expected=bruteMask(gate,nPoint)
+            if(gate[0]=='periodic' or type(gate[0])!=str):
+                #Only complete periods are visible
+                period=gate[-2]+gate[-1]
+                expected[nPoint//period*period:]=False
+            assert (mask==expected).all(),(gate,nPoint)
+            #Sorted, disjoint and not touching
+            assert (starts<stops).all() and (stops[:-1]<starts[1:]).all(),(gate,nPoint)
+
+def test_mask():
+    for gate in gates:
+        nPoint=1001
+        full=np.zeros(nPoint,dtype=bool)
+        for start,stop in zip(*gateSegments(gate,nPoint)):
+            full[start:stop]=True
+        for start,length in [(0,nPoint),(13,700),(995,6),(500,1)]:
+            assert (gateMask(gate,nPoint,start,length)==full[start:start+length]).all(),(gate,start)
+
+def test_mask_file(tmp_path):
+    path=str(tmp_path/'mask.npy')
+    np.save(path,np.array([1,1,0,1,0,0,1],dtype=bool))
+    starts,stops=gateSegments(('mask',path),20)
+    mask=np.zeros(20,dtype=bool)
+    for start,stop in zip(starts,stops):
+        mask[start:stop]=True
+    assert (mask==np.resize(np.array([1,1,0,1,0,0,1],dtype=bool),20)).all()
+    assert (stops[:-1]<starts[1:]).all()
+
+def test_mask_shapes(tmp_path):
+    pattern=np.array([[1,0,0,1,1],[0,1,0,0,0]],dtype=bool)
+    np.save(str(tmp_path/'mask.npy'),pattern)
+    np.savetxt(str(tmp_path/'mask.txt'),pattern.astype(int))
+    for name in ('mask.npy','mask.txt'):
+        starts,stops=gateSegments(('mask',str(tmp_path/name)),23)
+        mask=np.zeros(23,dtype=bool)
+        for start,stop in zip(starts,stops):
+            mask[start:stop]=True
+        assert (mask==np.resize(pattern.ravel(),23)).all(),name
+
+def test_mask_gate(tmp_path):
+    path=str(tmp_path/'mask.npy')
+    np.save(path,np.zeros(0,dtype=bool))
+    with pytest.raises(ValueError):
+        makeGate('mask',1,0,{'path':path})
+    np.save(path,np.array([1,0],dtype=bool))
+    gate=makeGate('mask',1,0,{'path':path})
+    #A new content of the file is a new gate (cache key)
+    os.utime(path,(0,1))
+    assert makeGate('mask',1,0,{'path':path})!=gate
+
+def test_Segments():
+    curve=np.random.default_rng(0).random((3,1001))
+    for gate in gates:
+        segments=Segments(*gateSegments(gate,1001),1001)
+        segments.values[:,segments.columns()]=curve[:,segments.indices()]
+        visible=gateMask(gate,1001)
+        for t in range(1001):
+            point=segments.at(t)
+            assert (point is None)==(not visible[t])
+            if(point is not None):
+                assert (point==curve[:,t]).all()
+        times=segments.times()
+        assert (np.isnan(times)==np.isnan(segments.values[0])).all()
+        for stop in (0,1,500,1001):
+            prefix=segments.prefix(stop)
+            assert (prefix[:,~np.isnan(prefix[0])]==curve[:,:stop][:,visible[:stop]]).all()
+        single=segments.stops-segments.starts==1
+        assert (segments.singles()==curve[:,segments.starts[single]]).all()
+        assert sum(len(piece) for piece in segments.pieces())==visible.sum()
+
+def test_GatedOverview(monkeypatch):
+    import store
+    from lod import GatedOverview
+    monkeypatch.setattr(store,'chunkLen',1000)
+    nPoint=20011
+    curve=np.random.default_rng(0).random((3,nPoint))
+    for gate in gates:
+        visible=gateMask(gate,nPoint)
+        gated=np.where(visible,curve,np.nan)
+        starts,stops=store.visibleSegments(gated)
+        expected=gateSegments(gate,nPoint)
+        assert (starts==expected[0]).all() and (stops==expected[1]).all(),gate
+        for length in (300,5000,10**6):
+            overview=GatedOverview(gated,starts,stops,length)
+            level,times=overview.levels[0],overview.indices[0]
+            assert level.shape[1]<=max(length,3),(gate,length)
+            on=~np.isnan(times)
+            t=times[on].astype(int)
+            assert visible[t].all() and (level[:,on]==curve[:,t]).all()
+            #Columns next to each other are in the same segment, the segments kept have their ends
+            pairs=on[:-1]&on[1:]
+            segment=np.searchsorted(stops,times[:-1][pairs],side='right')
+            assert (times[1:][pairs]<stops[segment]).all(),(gate,length)
+            assert np.isin(overview.starts,t).all() and np.isin(overview.stops-1,t).all()
+            if(length==10**6):
+                assert on.sum()==visible.sum()
+            for stop in (1,777,nPoint):
+                prefix=overview.prefix(0,stop)
+                if(visible[stop-1] and np.isin(stop-1,np.concatenate([np.arange(a,b) for a,b in zip(overview.starts,overview.stops)]))):
+                    assert (prefix[:,-1]==curve[:,stop-1]).all(),(gate,length,stop)
+                assert not(np.isin(prefix[0],curve[0,stop:]).any())
@@ -0,0 +1,167 @@
+"""
+Trajectory engine : compute the wave for the 3 axes without any GUI
+Results are memoized so switching between presets costs nothing
+"""
+import numpy as np
+import threading
+from collections import OrderedDict
+from gating import Segments,gateSegments,gateMask
+
+axisName=['x','y','z']
+cacheSize=32 #Number of trajectories kept in memory
+blockLen=1024 #Length of the blocks used by cosRamp
+_cache=OrderedDict()
+_cacheLock=threading.Lock() #trajectory is also called by the worker thread of the GUI
+
+#Type of function generated, broadcast over numpy arrays
+def B(freq,amplitude,phi,dt,nPoint,**kwargs):
+    K=kwargs.get('offset',0)
+    return amplitude*np.cos(2*np.pi*freq*dt/nPoint+phi)+K
+
+def axisParameters(waveParameters):
+    """
+    Return frequency, amplitude, phase and offset as (3,1) columns (x,y,z)
+    """
+    return [np.array([[waveParameters[name+' '+axis]] for axis in axisName],dtype=float) for name in ('frequency','amplitude','phase','offset')]
+
+def cosRamp(freq,phi,nPoint,amplitude=1,start=0,length=None):
+    """
+    amplitude*cos(2*pi*freq*t/nPoint+phi) for t in range(start,start+length) (until nPoint by default), parameters are (3,1) columns
+    cos is only evaluated on one block and one value per block, the rest comes from
+    cos(a+b)=cos(a)cos(b)-sin(a)sin(b), much faster than nPoint evaluations of cos
+    """
+    if(length is None):
+        length=nPoint-start
+    dt=2*np.pi*freq/nPoint
+    nBlock=-(-length//blockLen)
+    inBlock=dt*np.arange(blockLen) #(3,blockLen)
+    startBlock=dt*(blockLen*np.arange(nBlock)+start)+phi #(3,nBlock)
+    out=np.empty((len(freq),nBlock,blockLen))
+    tmp=np.empty_like(out)
+    np.multiply((amplitude*np.cos(startBlock))[:,:,None],np.cos(inBlock)[:,None,:],out=out)
+    np.multiply((amplitude*np.sin(startBlock))[:,:,None],np.sin(inBlock)[:,None,:],out=tmp)
+    out-=tmp
+    out=out.reshape(len(freq),-1)
+    return out if length==out.shape[1] else out[:,:length].copy()
+
+def computeWaves(freq,amplitude,phi,offset,nPoint,fragmented,start=0,length=None):
+    coord=cosRamp(freq,phi,nPoint,amplitude,start,length)
+    coord+=offset
+    if(fragmented is not None):
+        #NaN : nothing is drawn for the samples off
+        coord[:,~gateMask(fragmented,nPoint,start,coord.shape[1])]=np.nan
+    return coord
+
+def computeTrajectory(waveParameters,nPoint,fragmented=None):
+    """
+    Generate the (3,nPoint) array of the wave in one call
+    fragmented : None or a gate (see gating.py), samples off are set to NaN
+    """
+    return computeWaves(*axisParameters(waveParameters),nPoint,fragmented)
+
+def computeGated(waveParameters,nPoint,gate):
+    """
+    gating.Segments of the wave seen through gate, only the visible samples are computed and stored
+    """
+    segments=Segments(*gateSegments(gate,nPoint),nPoint)
+    freq,amplitude,phi,offset=axisParameters(waveParameters)
+    segments.values[:,segments.columns()]=B(freq,amplitude,phi,segments.indices(),nPoint,offset=offset)
+    segments.values.setflags(write=False)
+    return segments
+
+def ensembleColumns(waves):
+    """
+    Columns (3N,1) of frequency, amplitude, phase and offset of a list of N waveParameters
+    """
+    return [np.concatenate(parameter) for parameter in zip(*(axisParameters(wave) for wave in waves))]
+
+def computeEnsemble(waves,nPoint,fragmented=None):
+    """
+    Generate the (N,3,nPoint) array of a list of N waveParameters in one call
+    """
+    return computeWaves(*ensembleColumns(waves),nPoint,fragmented).reshape(len(waves),3,nPoint)
+
+def sweepWaves(waveParameters,name,start,stop,n):
+    """
+    n copies of waveParameters where the parameter name goes linearly from start to stop
+    """
+    return [dict(waveParameters,**{name:value}) for value in np.linspace(start,stop,n)]
+
+def interpolateWaves(start,end,n):
+    """
+    n waveParameters going linearly from start to end (every parameter)
+    """
+    return [{name:(1-a)*start[name]+a*end[name] for name in start} for a in np.linspace(0,1,n)]
+
+def blendKeyframes(keyframes,position,out=None):
+    """
+    Curve at position (0 to 1) between the (K,3,nPoint) keyframes (K>1), linear interpolation between the 2 closest ones
+    out : (3,nPoint) array written instead of allocating a new one
+    """
+    x=position*(len(keyframes)-1)
+    k=min(int(x),len(keyframes)-2)
+    #keyframes[k]+a*(keyframes[k+1]-keyframes[k]) without temporary array
+    out=np.subtract(keyframes[k+1],keyframes[k],out=out)
+    out*=x-k
+    out+=keyframes[k]
+    return out
+
+def waveKey(waveParameters):
+    return tuple(waveParameters[name] for name in sorted(waveParameters))
+
+def cached(key,compute):
+    """
+    Return the result of compute() stored with key, arrays of the result are made read-only
+    """
+    with _cacheLock:
+        if(key in _cache):
+            _cache.move_to_end(key)
+            return _cache[key]
+    result=compute()
+    for array in (result if type(result)==tuple else (result,)):
+        if(isinstance(array,np.ndarray)):
+            array.setflags(write=False)
+    with _cacheLock:
+        _cache[key]=result
+        if(len(_cache)>cacheSize):
+            _cache.popitem(last=False)
+    return result
+
+def trajectory(waveParameters,nPoint,fragmented=None):
+    """
+    Cached version of computeTrajectory, the array returned is read-only
+    """
+    key=(waveKey(waveParameters),nPoint,fragmented)
+    return cached(key,lambda:computeTrajectory(waveParameters,nPoint,fragmented))
+
+def gatedTrajectory(waveParameters,nPoint,gate):
+    """
+    Cached version of computeGated
+    """
+    key=('gated',waveKey(waveParameters),nPoint,gate)
+    return cached(key,lambda:computeGated(waveParameters,nPoint,gate))
+
+def ensembleTrajectory(waves,nPoint,fragmented=None,normalize=True):
+    """
+    Cached superposition (3,nPoint) and ensemble (N,3,nPoint) of the list of waveParameters waves
+    normalize : superposition divided by N so it keeps the scale of the waves
+    """
+    def compute():
+        ensemble=computeEnsemble(waves,nPoint,fragmented)
+        superposition=ensemble.sum(axis=0)
+        if(normalize):
+            superposition/=len(waves)
+        return superposition,ensemble
+    key=('ensemble',tuple(waveKey(wave) for wave in waves),nPoint,fragmented,normalize)
+    return cached(key,compute)
+
+def sweepTrajectory(start,end,nKey,nPoint,fragmented=None):
+    """
+    Cached (nKey,3,nPoint) keyframes of the sweep from the waveParameters start to end, computed in one call
+    """
+    key=('sweep',waveKey(start),waveKey(end),nKey,nPoint,fragmented)
+    return cached(key,lambda:computeEnsemble(interpolateWaves(start,end,nKey),nPoint,fragmented))
+
+def clearCache():
+    with _cacheLock:
+        _cache.clear()
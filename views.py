@@ -0,0 +1,78 @@
+"""
+2D views next to the 3D axes : one component along the time (x-t, y-t, z-t) or a projection on a plane (XY, XZ, YZ)
+Views are given rows of the arrays of the scene (no copy of the trajectory) and drawn by the animation of the scene :
+their curves are part of the background, only the cursors move
+"""
+axisIndex={'x':0,'y':1,'z':2}
+viewNames=['x-t','y-t','z-t','XY','XZ','YZ']
+
+class TimeView:
+    """
+    Component of the trajectory along the time, the cursor is the current sample
+    """
+    def __init__(self,ax,name):
+        self.ax=ax
+        self.k=axisIndex[name[0]]
+        self.curve,=ax.plot([],[],color='blue',linewidth=0.8)
+        self.cursor,=ax.plot([],[],color='red',marker='o',markersize=3)
+        ax.set_ylabel(name[0],labelpad=1)
+        ax.tick_params(labelsize=5)
+
+    def setCurve(self,t,curve):
+        '''t : (n,) times of the (3,n) samples of curve'''
+        self.curve.set_data(t,curve[self.k])
+
+    def plotTime(self,time,point):
+        '''point : (3,) sample at time, None when it is not visible'''
+        if(point is None):
+            self.cursor.set_data([],[])
+        else:
+            self.cursor.set_data([time],[point[self.k]])
+
+    def setLimits(self,lims,nPoint):
+        '''lims : limits of the x, y and z axes of the 3D axes, nPoint : length of the time axis'''
+        self.ax.set_xlim(0,max(1,nPoint-1))
+        self.ax.set_ylim(lims[self.k])
+
+    def curveArtists(self):
+        return [self.curve]
+
+    def artists(self):
+        return [self.cursor]
+
+class ProjectionView:
+    """
+    Projection of the trajectory on the plane of 2 axes, the vector is the current sample
+    """
+    def __init__(self,ax,name):
+        self.ax=ax
+        self.i=axisIndex[name[0].lower()]
+        self.j=axisIndex[name[1].lower()]
+        self.curve,=ax.plot([],[],color='blue',linewidth=0.8)
+        self.vector,=ax.plot([],[],color='red',marker='o',markersize=3,markevery=[1])
+        ax.set_xlabel(name[0].lower(),labelpad=1)
+        ax.set_ylabel(name[1].lower(),labelpad=1)
+        ax.set_aspect('equal',adjustable='box')
+        ax.tick_params(labelsize=5)
+
+    def setCurve(self,t,curve):
+        self.curve.set_data(curve[self.i],curve[self.j])
+
+    def plotTime(self,time,point):
+        if(point is None):
+            self.vector.set_data([],[])
+        else:
+            self.vector.set_data([0,point[self.i]],[0,point[self.j]])
+
+    def setLimits(self,lims,nPoint):
+        self.ax.set_xlim(lims[self.i])
+        self.ax.set_ylim(lims[self.j])
+
+    def curveArtists(self):
+        return [self.curve]
+
+    def artists(self):
+        return [self.vector]
+
+def makeView(ax,name):
+    return TimeView(ax,name) if name.endswith('-t') else ProjectionView(ax,name)
@@ -4,197 +4,45 @@ version : 1.0
 date : 06/2021
 author : Valentin Tardieux
 """
-import numpy as np
 import sys
-import matplotlib.animation as animation
-from mpl_toolkits.mplot3d import Axes3D
 import PyQt5.QtWidgets as QtWidgets
 import PyQt5.QtCore as QtCore
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import (FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar)
-## Global Variables
-
-#Animation parameters
-animParameters={'nPoint':360,'interval':30,'repeat':True,'repeat_delay':0,'nVector':1,'fragmentedNoPlotLen':5,'fragmentedPlotLen':10,'fps':60,'writer':'imagemagick'} #Warning : nPoint>nVector !
-
-#dictionary with different sate : {'name' (str):initial_state(bool)}
-state={'vector':True,'timeTrack':False,'vectorTrack':False,'static':True,'autoscale':True,'fragmented':False}
-
-#Frequency & amplitude parameters for each axis, updated thanks to the GUI:
-parametersName=['frequency x','frequency y','frequency z','amplitude x','amplitude y','amplitude z','phase x','phase y','phase z','offset x','offset y','offset z']
-waveParameters={'frequency x':2,'frequency y':2,'frequency z':0,'amplitude x':1,'amplitude y':1,'amplitude z':1,'phase x':0,'phase y':np.pi/2,'phase z':0,'offset x':0,'offset y':0,'offset z':0}
-
-#Preset rules : {'name of the figure' : [fx,fy,fz,Ax,Ay,Az,Phix,Phiy,Phiz,offsetx,offsety,offsetz]}
-presetParameters={'Flat Disk':['frequency x','frequency x',0,'amplitude x','amplitude x',0,0,np.pi/2,0,0,0,0],'Wide Cone':['frequency x','frequency x',0,'amplitude x','amplitude y','amplitude z',0,'phase y',0,0,0,0],'Small Cone':['frequency x','frequency x',0,'amplitude x','amplitude x','amplitude z',0,'phase y',0,0,0,0],'Permanent Magnet':[0,0,0,'amplitude x','amplitude y','amplitude z','phase x','phase y','phase z',0,0,0],'Pendulum':['frequency x','frequency x',0,'amplitude x','amplitude y','amplitude z',0,0,0,0,0,0],'Swinging Rotation':['frequency x','frequency x','frequency z','amplitude x','amplitude x','amplitude z',0,np.pi/2,0,0,0,0],'Alternating':[0,0,'frequency z',0,0,'amplitude z',0,0,0,0,0,0],'Alternating + Constant':[0,0,'frequency z',0,0,'amplitude z',0,0,0,0,0,'offset z'],'Free Mode':parametersName}
-
-#Only values for parameters independant and can be changed
-wavePresetValue={'Flat Disk':[None]*12,'Wide Cone':[1,2,2,3,np.pi/2],'Small Cone':[1,1,10,np.pi/2],'Permanent Magnet':[1,2,3,0,0,0],'Pendulum':[1,1,2,1],'Swinging Rotation':[1,10,5,1],'Alternating':[3,2],'Alternating + Constant':[3,4,2],'Free Mode':[None]*12}
-
-#Type of function generated
-def B(freq,amplitude,phi,dt,**kwargs):
-    K=kwargs.get('offset',0)
-    return amplitude*np.cos(2*np.pi*freq*dt/animParameters['nPoint']+phi)+K
-
+from parameters import animParameters,state,parametersName,waveParameters,presetParameters,wavePresetValue,ensembleParameters,streamParameters,sweepParameters,gateParameters,viewParameters
+from gating import patterns
+from views import viewNames
 ## Windows
-#Canvas where animation object is displayed
-class MplCanvas(FigureCanvasQTAgg):
-    def __init__(self, parent=None, width=500, height=400, dpi=100):
-        fig=Figure(figsize=(width, height), dpi=dpi)
-        self.fig=fig
-        super(MplCanvas, self).__init__(fig)
-        self.ax = fig.subplots(subplot_kw={'projection': '3d'})
-        self.ax.grid(False)
-        self.vectorTrackFig=[[]for i in range(animParameters['nPoint'])]
-        self.Barray=self.Bgen()
-        self.resizeVect()
-        self.figDic={'track':self.ax.plot([],[],[],color='green'),'static':self.ax.plot([],[],[],color='blue')}
-        self.anim()
-    def anim(self):
-        """
-        Call funcAnimation of animation module which call update
-        """
-        def update(frame):
-            """
-            frame : iterator object
-            Select in function of the state the plot wanted
-            """
-            #Maximum of amplitude of one axe set the scale for the other
-            if(state['autoscale']):
-                lim=max(waveParameters['amplitude x']+waveParameters['offset x'],waveParameters['amplitude y']+waveParameters['offset y'],waveParameters['amplitude z']+waveParameters['offset z'])
-                self.ax.set_xlim3d(-lim,lim)
-                self.ax.set_ylim3d(-lim,lim)
-                self.ax.set_zlim3d(-lim,lim)
-            #3 plots avaible monitored by a checkbox:
-            if(state['vectorTrack']):
-                self.plotVectorTrack(animParameters['nVector'],frame)
-            if(state['vector'] and not(state['vectorTrack'])):
-                self.plotVectorTrack(1,frame)
-                #Vector : plot a vector between (0,0) and the point (x,y,z) at t
-            if(state['static']):
-                self.plotStatic()
-                #Stationary : plot the entire  signal
-            if(state['timeTrack']):
-                self.plotTimeTrack(frame)
-                #Track : plot frame by frame the signal
-            return self.figDic['track'][0],self.figDic['static'][0],self.vectorTrackFig
-        self.animation = animation.FuncAnimation(self.fig, update,frames=animParameters['nPoint'], blit=False,interval=animParameters['interval'],repeat=animParameters['repeat'],save_count=animParameters['nPoint'],repeat_delay=animParameters['repeat_delay']) #function of matplotlib module, call update at each frame, call init for the first frame
-
-    def Bgen(self):
-        """
-        Generate a new array thanks to B function
-        """
-        coord=np.empty((3,animParameters['nPoint']),dtype=float)
-        for t in range(0,animParameters['nPoint']):
-            coord[0][t]=B(waveParameters['frequency x'],waveParameters['amplitude x'],waveParameters['phase x'],t,offset=waveParameters['offset x'])
-            coord[1][t]=B(waveParameters['frequency y'],waveParameters['amplitude y'],waveParameters['phase y'],t,offset=waveParameters['offset y'])
-            coord[2][t]=B(waveParameters['frequency z'],waveParameters['amplitude z'],waveParameters['phase z'],t,offset=waveParameters['offset z'])
-
-        #When fragmented is enabled
-        if(state['fragmented']):
-            totalLen=int(animParameters['fragmentedNoPlotLen']+animParameters['fragmentedPlotLen'])
-            step=int(animParameters['nPoint']/totalLen)
-            bfragmented=np.zeros((3,animParameters['nPoint']),dtype=float)
-            plotLen=animParameters['fragmentedPlotLen']
-            for i in range(step):
-                bfragmented[0][i*totalLen:i*totalLen+plotLen]=coord[0][i*totalLen:i*totalLen+plotLen]
-                bfragmented[1][i*totalLen:i*totalLen+plotLen]=coord[1][i*totalLen:i*totalLen+plotLen]
-                bfragmented[2][i*totalLen:i*totalLen+plotLen]=coord[2][i*totalLen:i*totalLen+plotLen]
-            coord=bfragmented
-        return coord
-
-    def plotVectorTrack(self,nVect,time):
-        '''
-        Plot nVect vector
-        attenuation decreasing in 1/nVect, last vector ploted has a attenuation of 1 then decreasing
-        '''
-        ind=time%nVect #time modulo number of vector(ie. time module number of vector plot in resize function)
-        self.vectorTrackFig[ind][0].set_data_3d([0,self.Barray[0][time]],[0,self.Barray[1][time]],[0,self.Barray[2][time]])#Set new data for the plot at the index ind with the current time
-        self.opacity(self.vectorTrackFig,nVect,ind)
-
-    def opacity(self,plotArray,nArray,ind):
-        transparencyInterval=1/nArray #step of transparency
-        indT=(ind+1)%nArray #index for transparency, start with the lower opacity(ie the last index of our array
-        count=1 #count turn number of loop while did
-        while(count<nArray+1):
-            plotArray[indT][0].set_alpha(count*transparencyInterval)#set opacity
-            count+=1
-            indT+=1 #3 lines : ie indT+1 modulo nArray
-            if(indT==nArray):
-                indT=0
-    def plotStatic(self):
-        self.figDic['static'][0].set_data_3d(self.Barray)
-
-    def plotTimeTrack(self,time):
-        self.figDic['track'][0].set_data_3d(self.Barray[0][:time],self.Barray[1][:time],self.Barray[2][:time])
-
-    def func_clear(self):
-        '''clear draw and reset coord '''
-        self.animation.pause()
-        #reset frame
-        self.animation.frame_seq=self.animation.new_frame_seq()
-        #delete former values computed
-        self.initCoord(self.figDic['track'][0])
-        self.initCoord(self.figDic['static'][0])
-        # self.initVect(animParameters['nVector'])
-        self.resizeVect()
-        self.animation.resume()
-    def initVect(self,nbVector):
-        for i in range(nbVector):
-            self.initCoord(self.vectorTrackFig[i][0])
-    def initCoord(self,name):
-    #Reset values for each axis
-        name.set_data_3d([],[],[])
-    def resizeVect(self):
-        #Compute the previous size
-        indPrevSize=0
-        while(self.vectorTrackFig[indPrevSize]!=[]):
-            indPrevSize+=1
-        #Reset previous coord
-        self.initVect(indPrevSize)
-        for indNewPlot in range(indPrevSize,animParameters['nVector']):
-            self.vectorTrackFig[indNewPlot]=self.ax.plot([],[],[],'->',color='red')
-
-        #Delete slot if new nVector is inferior to the previous
-        for indRemovePlot in range(animParameters['nVector'],indPrevSize):
-            self.vectorTrackFig[indRemovePlot]=[]
-
-    def markerChanged(self,marker,line):
-        for figName in self.figDic:
-            self.figDic[figName][0].set_marker(marker)
-            self.figDic[figName][0].set_linestyle(line)
-
-    def stopAnim(self):
-        self.animation.repeat=False
-        self.animation.__del__()
-
-
+#matplotlib, the canvas and the first trajectory are loaded once the window is shown, see MainWindow.initCanvas
+#The widgets only write the parameters, the canvas observes them (see canvas.MplCanvas.applyChanges)
 #CheckBox
 class CheckBoxCustom(QtWidgets.QCheckBox):
-    def __init__(self,name,status,visu,window):
+    def __init__(self,name,status,window,parameters=state):
         super().__init__(name)
         self.status=status
-        self.visu=visu
         self.w=window
-        self.setChecked(state[self.status])
+        self.parameters=parameters
+        self.setChecked(self.parameters[self.status])
         self.toggled.connect(self.stateSwitch)
 
     def stateSwitch(self):
-        global state
-        state[self.status]=not(state[self.status])
-        if(self.status=='static'):
-            self.visu.initCoord(self.visu.figDic['static'][0])
-        if(self.status=='timeTrack'):
-            self.visu.initCoord(self.visu.figDic['track'][0])
-        if(self.status=='vectorTrack' or self.status=='vector'):
-            self.visu.initVect(animParameters['nVector'])
         if(self.status=='fragmented'):
-            if(state[self.status]):
-                self.visu.markerChanged('.','')
-            else:
-                self.visu.markerChanged('','-')
-            self.w.noise_spinPlotLen.setEnabled(state[self.status])
-            self.w.noise_spinNoPlotLen.setEnabled(state[self.status])
-            self.visu.Barray=self.visu.Bgen()
+            for widget in (self.w.noise_spinPlotLen,self.w.noise_spinNoPlotLen,self.w.noise_combo,self.w.noise_edit):
+                widget.setEnabled(self.isChecked())
+        if(self.status=='ensemble'):
+            self.w.ensemble_combo.setEnabled(self.isChecked())
+            self.w.ensemble_spinN.setEnabled(self.isChecked())
+            self.w.ensemble_spinStart.setEnabled(self.isChecked())
+            self.w.ensemble_spinStop.setEnabled(self.isChecked())
+        if(self.status=='sweep'):
+            for widget in (self.w.sweep_comboStart,self.w.sweep_comboEnd,self.w.sweep_spinDuration,self.w.sweep_spinKey):
+                widget.setEnabled(self.isChecked())
+        if(self.status=='stream'):
+            try:
+                self.parameters[self.status]=self.isChecked()
+            except OSError as error:
+                QtWidgets.QMessageBox.warning(self.w,'Stream','Source not available : '+str(error))
+                self.setChecked(False)
+        else:
+            self.parameters[self.status]=self.isChecked()
 
 
 class PresetList(QtWidgets.QListWidget):
@@ -234,7 +82,9 @@ class PresetList(QtWidgets.QListWidget):
                 if(parametersName[i]==preset[i]):
                     defaultValue=wavePresetValue[presetName][indPreset]
                     if(defaultValue!=None):
+                        self.w.parametersBox[parametersName[i]].blockSignals(True)
                         self.w.parametersBox[parametersName[i]].setValue(defaultValue)
+                        self.w.parametersBox[parametersName[i]].blockSignals(False)
                     indPreset+=1
         self.presetInit()
 
@@ -244,26 +94,23 @@ class PresetList(QtWidgets.QListWidget):
         presetName=presetName.text()
         preset=self.list[presetName]
         indDefaultValue=0
-        #set parameters with rules selected
+        #set parameters with rules selected, without calling presetInit again
         for i in range(len(parametersName)):
-            self.w.parametersBox[parametersName[i]].disconnect()
+            self.w.parametersBox[parametersName[i]].blockSignals(True)
             indDefaultValue=self.presetActBox(self.w.parametersBox,parametersName[i],preset[i],presetName,indDefaultValue)
+            self.w.parametersBox[parametersName[i]].blockSignals(False)
 
-        #gen a new B function
+        #A new B function is generated by the canvas if one of the values changed
         for name in self.w.parametersBox:
             waveParameters[name]=self.w.parametersBox[name].value()
-            self.w.parametersBox[name].valueChanged.connect(self.presetInit)
-        self.w.visu.Barray=self.w.visu.Bgen()
-        self.w.visu.func_clear()
 
 
 #Parameters box : allows to set new value for frequency and amplitude
 class ParametersBox(QtWidgets.QDoubleSpinBox):
 
-    def __init__(self,name,visu,w):
+    def __init__(self,name,w):
         super().__init__()
         self.name=name
-        self.visu=visu
         self.w=w
         self.setValue(waveParameters[self.name])
         self.setPrefix(self.name[-1]+' : ')
@@ -276,24 +123,28 @@ class ParametersBox(QtWidgets.QDoubleSpinBox):
 
 #Main window
 class MainWindow(QtWidgets.QMainWindow):
+    canvasReady=QtCore.pyqtSignal()
+
     def __init__(self, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
         self.setWindowTitle('3D Visualize')
 
-        #left panel : visual
-        self.visu = MplCanvas(self, width=500, height=400, dpi=150)
-        lpanel=QtWidgets.QVBoxLayout()
-        lpanel.addWidget(NavigationToolbar(self.visu, self))
-        lpanel.addWidget(self.visu)
+        #left panel : visual, the canvas replaces the label in initCanvas
+        self.visu=None
+        self.loading=QtWidgets.QLabel('Loading...')
+        self.loading.setAlignment(QtCore.Qt.AlignCenter)
+        self.loading.setMinimumSize(500,400)
+        self.lpanel=QtWidgets.QVBoxLayout()
+        self.lpanel.addWidget(self.loading)
 
         #right panel : User controls
         rpanel=QtWidgets.QVBoxLayout()
         #Frequency :
         freq_panel=QtWidgets.QHBoxLayout()
         freq_label=QtWidgets.QLabel('Frequency :')
-        freqX_box=ParametersBox('frequency x',self.visu,self)
-        freqY_box=ParametersBox('frequency y',self.visu,self)
-        freqZ_box=ParametersBox('frequency z',self.visu,self)
+        freqX_box=ParametersBox('frequency x',self)
+        freqY_box=ParametersBox('frequency y',self)
+        freqZ_box=ParametersBox('frequency z',self)
         freq_panel.addWidget(freq_label)
         freq_panel.addWidget(freqX_box)
         freq_panel.addWidget(freqY_box)
@@ -303,9 +154,9 @@ class MainWindow(QtWidgets.QMainWindow):
         #Amplitude :
         amp_panel=QtWidgets.QHBoxLayout()
         amp_label=QtWidgets.QLabel('Amplitude :')
-        ampX_box=ParametersBox('amplitude x',self.visu,self)
-        ampY_box=ParametersBox('amplitude y',self.visu,self)
-        ampZ_box=ParametersBox('amplitude z',self.visu,self)
+        ampX_box=ParametersBox('amplitude x',self)
+        ampY_box=ParametersBox('amplitude y',self)
+        ampZ_box=ParametersBox('amplitude z',self)
         amp_panel.addWidget(amp_label)
         amp_panel.addWidget(ampX_box)
         amp_panel.addWidget(ampY_box)
@@ -315,9 +166,9 @@ class MainWindow(QtWidgets.QMainWindow):
         #Phase
         phase_panel=QtWidgets.QHBoxLayout()
         phase_label=QtWidgets.QLabel('Phase (rad) :')
-        phaseX_box=ParametersBox('phase x',self.visu,self)
-        phaseY_box=ParametersBox('phase y',self.visu,self)
-        phaseZ_box=ParametersBox('phase z',self.visu,self)
+        phaseX_box=ParametersBox('phase x',self)
+        phaseY_box=ParametersBox('phase y',self)
+        phaseZ_box=ParametersBox('phase z',self)
         phase_panel.addWidget(phase_label)
         phase_panel.addWidget(phaseX_box)
         phase_panel.addWidget(phaseY_box)
@@ -327,9 +178,9 @@ class MainWindow(QtWidgets.QMainWindow):
         #Offset
         offset_panel=QtWidgets.QHBoxLayout()
         offset_label=QtWidgets.QLabel('Offset :')
-        offsetX_box=ParametersBox('offset x',self.visu,self)
-        offsetY_box=ParametersBox('offset y',self.visu,self)
-        offsetZ_box=ParametersBox('offset z',self.visu,self)
+        offsetX_box=ParametersBox('offset x',self)
+        offsetY_box=ParametersBox('offset y',self)
+        offsetZ_box=ParametersBox('offset z',self)
         offset_panel.addWidget(offset_label)
         offset_panel.addWidget(offsetX_box)
         offset_panel.addWidget(offsetY_box)
@@ -345,35 +196,150 @@ class MainWindow(QtWidgets.QMainWindow):
         noise_panel=QtWidgets.QGridLayout()
         noise_label=QtWidgets.QLabel('Fragmented plot : ')
 
-        noise_check=CheckBoxCustom('Enabled','fragmented',self.visu,self)
+        self.noise_check=CheckBoxCustom('Enabled','fragmented',self)
         def spinfragmentedPlot():
             self.noise_spinPlotLen.setMaximum(animParameters['nPoint']-animParameters['fragmentedNoPlotLen'])
             animParameters['fragmentedPlotLen']=self.noise_spinPlotLen.value()
-            self.visu.func_clear()
-            self.visu.Barray=self.visu.Bgen()
         def spinfragmentedNo():
             self.noise_spinPlotLen.setMaximum(animParameters['nPoint']-animParameters['fragmentedPlotLen'])
             animParameters['fragmentedNoPlotLen']=self.noise_spinNoPlotLen.value()
-            self.visu.func_clear()
-            self.visu.Barray=self.visu.Bgen()
         self.noise_spinPlotLen=QtWidgets.QSpinBox()
         self.noise_spinPlotLen.setEnabled(False)
+        self.noise_spinPlotLen.setMinimum(1)
         self.noise_spinPlotLen.setMaximum(animParameters['nPoint'])
         self.noise_spinNoPlotLen=QtWidgets.QSpinBox()
+        self.noise_spinNoPlotLen.setMinimum(1)
         self.noise_spinNoPlotLen.setMaximum(animParameters['nPoint']-animParameters['fragmentedPlotLen'])
         self.noise_spinPlotLen.setValue(animParameters['fragmentedPlotLen'])
         self.noise_spinNoPlotLen.setValue(animParameters['fragmentedNoPlotLen'])
         self.noise_spinPlotLen.valueChanged.connect(lambda x: spinfragmentedNo())
         self.noise_spinNoPlotLen.valueChanged.connect(lambda x: spinfragmentedPlot())
         self.noise_spinNoPlotLen.setEnabled(False)
+        #Gating pattern, see gating.py
+        self.noise_combo=QtWidgets.QComboBox()
+        self.noise_combo.addItems(patterns)
+        self.noise_combo.setCurrentText(gateParameters['pattern'])
+        self.noise_edit=QtWidgets.QLineEdit(gateParameters['path'])
+        self.noise_edit.setPlaceholderText('mask file')
+        def gateChanged():
+            gateParameters['pattern']=self.noise_combo.currentText()
+            gateParameters['path']=self.noise_edit.text().strip()
+        self.noise_combo.currentTextChanged.connect(lambda x: gateChanged())
+        self.noise_edit.editingFinished.connect(gateChanged)
+        self.noise_combo.setEnabled(False)
+        self.noise_edit.setEnabled(False)
         noise_panel.addWidget(noise_label,1,2,1,1)
-        noise_panel.addWidget(noise_check,2,2)
+        noise_panel.addWidget(self.noise_check,2,2)
         noise_panel.addWidget(QtWidgets.QLabel('Len of plot : '),1,3)
         noise_panel.addWidget(self.noise_spinPlotLen,2,3)
         noise_panel.addWidget(QtWidgets.QLabel('Len of no plot : '),1,4)
         noise_panel.addWidget(self.noise_spinNoPlotLen,2,4)
+        noise_panel.addWidget(self.noise_combo,1,5)
+        noise_panel.addWidget(self.noise_edit,2,5)
         noise_panel.setAlignment(QtCore.Qt.AlignTop)
         rpanel.addLayout(noise_panel)
+        #Ensemble of waves
+        ensemble_panel=QtWidgets.QGridLayout()
+        self.ensemble_check=CheckBoxCustom('Enabled','ensemble',self)
+        self.ensemble_combo=QtWidgets.QComboBox()
+        self.ensemble_combo.addItems(['presets']+parametersName)
+        self.ensemble_combo.setCurrentText(ensembleParameters['parameter'])
+        self.ensemble_spinN=QtWidgets.QSpinBox()
+        self.ensemble_spinN.setPrefix('N : ')
+        self.ensemble_spinN.setRange(1,200)
+        self.ensemble_spinN.setValue(ensembleParameters['n'])
+        self.ensemble_spinStart=QtWidgets.QDoubleSpinBox()
+        self.ensemble_spinStart.setPrefix('from : ')
+        self.ensemble_spinStart.setMaximum(animParameters['nPoint'])
+        self.ensemble_spinStart.setValue(ensembleParameters['start'])
+        self.ensemble_spinStop=QtWidgets.QDoubleSpinBox()
+        self.ensemble_spinStop.setPrefix('to : ')
+        self.ensemble_spinStop.setMaximum(animParameters['nPoint'])
+        self.ensemble_spinStop.setValue(ensembleParameters['stop'])
+        def ensembleChanged():
+            ensembleParameters['parameter']=self.ensemble_combo.currentText()
+            ensembleParameters['n']=self.ensemble_spinN.value()
+            ensembleParameters['start']=self.ensemble_spinStart.value()
+            ensembleParameters['stop']=self.ensemble_spinStop.value()
+        self.ensemble_combo.currentTextChanged.connect(lambda x: ensembleChanged())
+        for box in (self.ensemble_spinN,self.ensemble_spinStart,self.ensemble_spinStop):
+            box.valueChanged.connect(lambda x: ensembleChanged())
+            box.setEnabled(False)
+        self.ensemble_combo.setEnabled(False)
+        ensemble_panel.addWidget(QtWidgets.QLabel('Ensemble : '),1,1)
+        ensemble_panel.addWidget(self.ensemble_check,2,1)
+        ensemble_panel.addWidget(self.ensemble_combo,1,2)
+        ensemble_panel.addWidget(self.ensemble_spinN,2,2)
+        ensemble_panel.addWidget(self.ensemble_spinStart,1,3)
+        ensemble_panel.addWidget(self.ensemble_spinStop,2,3)
+        rpanel.addLayout(ensemble_panel)
+        #Sweep between 2 waves
+        sweep_panel=QtWidgets.QGridLayout()
+        sweep_check=CheckBoxCustom('Enabled','sweep',self)
+        self.sweep_comboStart=QtWidgets.QComboBox()
+        self.sweep_comboStart.addItems(['current']+list(presetParameters))
+        self.sweep_comboStart.setCurrentText(sweepParameters['start'])
+        self.sweep_comboEnd=QtWidgets.QComboBox()
+        self.sweep_comboEnd.addItems(['current']+list(presetParameters))
+        self.sweep_comboEnd.setCurrentText(sweepParameters['end'])
+        self.sweep_spinDuration=QtWidgets.QDoubleSpinBox()
+        self.sweep_spinDuration.setPrefix('duration : ')
+        self.sweep_spinDuration.setSuffix(' s')
+        self.sweep_spinDuration.setRange(0.1,3600)
+        self.sweep_spinDuration.setValue(sweepParameters['duration'])
+        self.sweep_spinKey=QtWidgets.QSpinBox()
+        self.sweep_spinKey.setPrefix('keyframes : ')
+        self.sweep_spinKey.setRange(2,1000)
+        self.sweep_spinKey.setValue(sweepParameters['keyframes'])
+        def sweepChanged():
+            sweepParameters['start']=self.sweep_comboStart.currentText()
+            sweepParameters['end']=self.sweep_comboEnd.currentText()
+            sweepParameters['duration']=self.sweep_spinDuration.value()
+            sweepParameters['keyframes']=self.sweep_spinKey.value()
+        for combo in (self.sweep_comboStart,self.sweep_comboEnd):
+            combo.currentTextChanged.connect(lambda x: sweepChanged())
+            combo.setEnabled(False)
+        for box in (self.sweep_spinDuration,self.sweep_spinKey):
+            box.valueChanged.connect(lambda x: sweepChanged())
+            box.setEnabled(False)
+        sweep_panel.addWidget(QtWidgets.QLabel('Sweep : '),1,1)
+        sweep_panel.addWidget(sweep_check,2,1)
+        sweep_panel.addWidget(self.sweep_comboStart,1,2)
+        sweep_panel.addWidget(self.sweep_comboEnd,2,2)
+        sweep_panel.addWidget(self.sweep_spinDuration,1,3)
+        sweep_panel.addWidget(self.sweep_spinKey,2,3)
+        rpanel.addLayout(sweep_panel)
+        #Stream of measured samples, settings applied when the stream is enabled
+        stream_panel=QtWidgets.QGridLayout()
+        stream_check=CheckBoxCustom('Enabled','stream',self)
+        self.stream_combo=QtWidgets.QComboBox()
+        self.stream_combo.addItems(['synthetic','file','socket','pipe'])
+        self.stream_combo.setCurrentText(streamParameters['source'])
+        self.stream_edit=QtWidgets.QLineEdit()
+        self.stream_edit.setPlaceholderText('file / pipe path or port')
+        self.stream_spinRate=QtWidgets.QSpinBox()
+        self.stream_spinRate.setPrefix('rate : ')
+        self.stream_spinRate.setSuffix(' /s')
+        self.stream_spinRate.setRange(1,1000000)
+        self.stream_spinRate.setValue(streamParameters['rate'])
+        def streamChanged():
+            streamParameters['source']=self.stream_combo.currentText()
+            text=self.stream_edit.text().strip()
+            if(streamParameters['source']=='socket'):
+                if(text.isdigit()):
+                    streamParameters['port']=int(text)
+            else:
+                streamParameters['path']=text
+            streamParameters['rate']=self.stream_spinRate.value()
+        self.stream_combo.currentTextChanged.connect(lambda x: streamChanged())
+        self.stream_edit.textChanged.connect(lambda x: streamChanged())
+        self.stream_spinRate.valueChanged.connect(lambda x: streamChanged())
+        stream_panel.addWidget(QtWidgets.QLabel('Stream : '),1,1)
+        stream_panel.addWidget(stream_check,2,1)
+        stream_panel.addWidget(self.stream_combo,1,2)
+        stream_panel.addWidget(self.stream_spinRate,2,2)
+        stream_panel.addWidget(self.stream_edit,1,3,2,1)
+        rpanel.addLayout(stream_panel)
         #Space
         spaceLayout=QtWidgets.QVBoxLayout()
         spaceLayout.setContentsMargins(0,20,0,20)
@@ -390,20 +356,16 @@ class MainWindow(QtWidgets.QMainWindow):
         #Vector panel
         vector_panel=QtWidgets.QHBoxLayout()
         vector_label=QtWidgets.QLabel('Vector settings')
-        vector_check=CheckBoxCustom('Vector','vector',self.visu,self)
-        vectorTrack_check=CheckBoxCustom('Vector with track','vectorTrack',self.visu,self)
+        vector_check=CheckBoxCustom('Vector','vector',self)
+        vectorTrack_check=CheckBoxCustom('Vector with track','vectorTrack',self)
         vector_box=QtWidgets.QSpinBox()
         vector_box.setPrefix('Track length :   ')
         vector_box.setMaximum(int(animParameters['nPoint']/2))
         vector_box.setMinimum(1)
         vector_box.setValue(animParameters['nVector'])
-        def vectorBoxValueChanged(visu):
-            self.visu.animation.pause()
-            # self.visu.initVect(animParameters['nVector'])
+        def vectorBoxValueChanged():
             animParameters['nVector']=vector_box.value()
-            self.visu.resizeVect()
-            self.visu.animation.resume()
-        vector_box.valueChanged.connect(lambda x: vectorBoxValueChanged(self.visu))
+        vector_box.valueChanged.connect(lambda x: vectorBoxValueChanged())
         vector_panel.addWidget(vector_label)
         vector_panel.addWidget(vector_check)
         vector_panel.addWidget(vectorTrack_check)
@@ -413,22 +375,32 @@ class MainWindow(QtWidgets.QMainWindow):
 
         #Custom panel
         custom_panel=QtWidgets.QVBoxLayout()
-        track_check=CheckBoxCustom('Time Tracker','timeTrack',self.visu,self)
-        static_check=CheckBoxCustom('Static state','static',self.visu,self)
-        autoscale_check=CheckBoxCustom('Auto-scale','autoscale',self.visu,self)
+        track_check=CheckBoxCustom('Time Tracker','timeTrack',self)
+        static_check=CheckBoxCustom('Static state','static',self)
+        autoscale_check=CheckBoxCustom('Auto-scale','autoscale',self)
+        profiler_check=CheckBoxCustom('Profiler','profiler',self)
         custom_panel.addWidget(track_check)
         custom_panel.addWidget(static_check)
         custom_panel.addWidget(autoscale_check)
+        custom_panel.addWidget(profiler_check)
         custom_panel.setAlignment(QtCore.Qt.AlignCenter)
         custom_panel.setContentsMargins(0,0,0,30)
         rpanel.addLayout(custom_panel)
 
+        #Views panel
+        view_panel=QtWidgets.QHBoxLayout()
+        view_panel.addWidget(QtWidgets.QLabel('Views : '))
+        for name in viewNames:
+            view_panel.addWidget(CheckBoxCustom(name,name,self,viewParameters))
+        view_panel.setContentsMargins(0,0,0,30)
+        rpanel.addLayout(view_panel)
+
         #Control panel
         control_panel=QtWidgets.QHBoxLayout()
         clear_button=QtWidgets.QPushButton('Clear and reset animation')
         pause_button=QtWidgets.QPushButton('Pause')
         resume_button=QtWidgets.QPushButton('Resume')
-        clear_button.clicked.connect(self.visu.func_clear)
+        clear_button.clicked.connect(lambda a:self.visu.func_clear())
         pause_button.clicked.connect(lambda a:self.visu.animation.pause())
         resume_button.clicked.connect(lambda a:self.visu.animation.resume())
         control_panel.addWidget(pause_button)
@@ -451,19 +423,109 @@ class MainWindow(QtWidgets.QMainWindow):
         exp_button=QtWidgets.QPushButton('Export animation')
         exp_button.clicked.connect(lambda r:record())
         exp_panel.addWidget(exp_button)
+        def recordProfile():
+            filePath=QtWidgets.QFileDialog.getSaveFileName(None,'Save as...','profile','*.csv *.json')[0]
+            if(filePath!=''):
+                self.visu.profiler.export(filePath)
+        prof_button=QtWidgets.QPushButton('Export profile')
+        prof_button.clicked.connect(lambda r:recordProfile())
+        exp_panel.addWidget(prof_button)
+        def saveSession():
+            filePath=QtWidgets.QFileDialog.getSaveFileName(None,'Save as...','session','*.npy')[0]
+            if(filePath!=''):
+                QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+                try:
+                    self.visu.saveSession(filePath)
+                except ValueError as error:
+                    self.visu.showError(str(error))
+                finally:
+                    QtWidgets.QApplication.restoreOverrideCursor()
+        def openSession():
+            filePath=QtWidgets.QFileDialog.getOpenFileName(None,'Open...','','*.npy')[0]
+            if(filePath!=''):
+                self.openSession(filePath)
+        save_button=QtWidgets.QPushButton('Save session')
+        save_button.clicked.connect(lambda r:saveSession())
+        exp_panel.addWidget(save_button)
+        open_button=QtWidgets.QPushButton('Open session')
+        open_button.clicked.connect(lambda r:openSession())
+        exp_panel.addWidget(open_button)
         exp_panel.setContentsMargins(0,0,0,10)
         rpanel.addLayout(exp_panel)
 
         #Position of panels
         panel=QtWidgets.QHBoxLayout()
-        panel.addLayout(lpanel)
-        panel.addLayout(rpanel)
+        panel.addLayout(self.lpanel)
+        #Controls enabled once the canvas exists
+        self.controls=QtWidgets.QWidget()
+        self.controls.setLayout(rpanel)
+        self.controls.setEnabled(False)
+        panel.addWidget(self.controls)
         widget = QtWidgets.QWidget()
         widget.setLayout(panel)
         self.setCentralWidget(widget)
         self.show()
+        QtCore.QTimer.singleShot(0,self.initCanvas)
+
+    def openSession(self,path):
+        '''Parameters and trajectory of a saved session, nothing is generated until a parameter is changed'''
+        from store import loadTrajectory
+        try:
+            result,session=loadTrajectory(path)
+        except Exception as error:
+            QtWidgets.QMessageBox.warning(self,'Session','Session not opened : %s : %s'%(type(error).__name__,error))
+            return
+        waveParameters.update(session['waveParameters'])
+        ensembleParameters.update(session['ensembleParameters'])
+        animParameters['nPoint']=session['nPoint']
+        animParameters['fragmentedPlotLen']=session['animParameters']['fragmentedPlotLen']
+        animParameters['fragmentedNoPlotLen']=session['animParameters']['fragmentedNoPlotLen']
+        gateParameters.update(session.get('gateParameters',{'pattern':'periodic'}))
+        state['fragmented']=session['fragmented'] is not None
+        state['ensemble']=session['state']['ensemble']
+        #Widgets updated without their signals, they would generate the trajectory again
+        widgets=list(self.parametersBox.values())+[self.preset_list,self.noise_check,self.noise_spinPlotLen,self.noise_spinNoPlotLen,self.noise_combo,self.noise_edit,self.ensemble_check,self.ensemble_combo,self.ensemble_spinN,self.ensemble_spinStart,self.ensemble_spinStop]
+        for widget in widgets:
+            widget.blockSignals(True)
+        #Free Mode : every parameter of the session can be changed
+        self.preset_list.setCurrentRow(list(presetParameters).index('Free Mode'))
+        for name in parametersName:
+            self.preset_list.presetActBox(self.parametersBox,name,name,'Free Mode',0)
+            self.parametersBox[name].setValue(waveParameters[name])
+        self.noise_check.setChecked(state['fragmented'])
+        self.noise_spinPlotLen.setValue(animParameters['fragmentedPlotLen'])
+        self.noise_spinNoPlotLen.setValue(animParameters['fragmentedNoPlotLen'])
+        self.noise_combo.setCurrentText(gateParameters['pattern'])
+        self.noise_edit.setText(gateParameters['path'])
+        self.ensemble_check.setChecked(state['ensemble'])
+        self.ensemble_combo.setCurrentText(ensembleParameters['parameter'])
+        self.ensemble_spinN.setValue(ensembleParameters['n'])
+        self.ensemble_spinStart.setValue(ensembleParameters['start'])
+        self.ensemble_spinStop.setValue(ensembleParameters['stop'])
+        for widget in widgets:
+            widget.blockSignals(False)
+        for widget in (self.noise_spinPlotLen,self.noise_spinNoPlotLen,self.noise_combo,self.noise_edit):
+            widget.setEnabled(state['fragmented'])
+        for widget in (self.ensemble_combo,self.ensemble_spinN,self.ensemble_spinStart,self.ensemble_spinStop):
+            widget.setEnabled(state['ensemble'])
+        self.visu.openSession(path,result)
+
+    def initCanvas(self):
+        '''3D canvas, animation and first trajectory, created once the window is shown (matplotlib is imported here)'''
+        #Window painted before the imports
+        QtWidgets.QApplication.processEvents()
+        from canvas import MplCanvas,NavigationToolbar
+        self.visu=MplCanvas(self, width=500, height=400, dpi=150)
+        self.lpanel.removeWidget(self.loading)
+        self.loading.deleteLater()
+        self.lpanel.addWidget(NavigationToolbar(self.visu, self))
+        self.lpanel.addWidget(self.visu)
+        self.controls.setEnabled(True)
+        self.canvasReady.emit()
+
     def closeEvent(self,event):
-        self.visu.stopAnim()
+        if(self.visu is not None):
+            self.visu.stopAnim()
 #Shows main window
 def main():
     app = QtWidgets.QApplication(sys.argv)